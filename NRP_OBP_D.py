@@ -1,5 +1,19 @@
+import re
+import time
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 import gurobipy as gp
+from solver_backends import solvers, relaxations, ScheduleSolution
+import heuristic
+import warm_start
+import decomposition
+import column_generation
+import two_stage
+import symmetry
+import feasibility
+import telemetry
+import profiling
 
 # variable declarations
 weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -33,8 +47,27 @@ handover_end = 654
 handover_time_range = range(handover_start, handover_end)	
 handover_duration = 2  # 2 intervals = 30 minutes
 break_duration = 2  # 2 intervals = 30 minutes
-
-def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
+big_m = 50  # Large number for the handover indicators, tighten_model replaces it per interval
+
+def interval_rates(day_salary, night_salary, rate_table=None):
+    """Salary per interval from the hourly rates, night 00:00-07:00 and 18:00-00:00, or from an hourly rate per interval"""
+    if rate_table is not None:
+        rate_table = np.asarray(rate_table, dtype=float)
+        if rate_table.shape != (len(time_range),):
+            raise ValueError(f"The rate table needs one hourly rate per interval, {len(time_range)} in total")
+        return rate_table / 4
+    times = np.arange(len(time_range))
+    return np.where((times % 96 < 28) | (times % 96 >= 72), night_salary / 4, day_salary / 4)
+
+def shift_costs(shift_df, interval_rate):
+    """Salary of every shift, the sum of the interval rates over its [Start, End) window"""
+    rate_sums = np.concatenate([[0.0], np.cumsum(interval_rate)])
+    shift_start = np.clip(shift_df['Start'].to_numpy(dtype=int), 0, len(time_range))
+    shift_end = np.clip(shift_df['End'].to_numpy(dtype=int), 0, len(time_range))
+    return rate_sums[shift_end] - rate_sums[shift_start]
+
+@profiling.profile('model_start')
+def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit, rate_table=None):
     schedule_costs = gp.Model("NurseScheduling")
     
     # Model parameters
@@ -45,7 +78,7 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
     shift_scheduled = schedule_costs.addVars(shift_df.index, vtype=gp.GRB.BINARY, name=f"shift_scheduled")
     nurse_active_at_time = schedule_costs.addVars(len(shift_df.index), time_range, vtype=gp.GRB.BINARY, name=f"nurse_active")
     all_nurses_active_at_time = schedule_costs.addVars(time_range, vtype=gp.GRB.INTEGER, name=f"nurses_scheduled")
-    works_shifts = schedule_costs.addVars(len(shift_df['Nurse_ID'].unique()), vtype=gp.GRB.BINARY, name=lambda i: f"works_shifts_{i}")
+    works_shifts = schedule_costs.addVars(len(shift_df['Nurse_ID'].unique()), vtype=gp.GRB.BINARY, name=[f"works_shifts_{i}" for i in range(len(shift_df['Nurse_ID'].unique()))])
 
     # variables for break scheduling
     break_start_time = schedule_costs.addVars(shift_df.index, vtype=gp.GRB.INTEGER, name=f"break_start_time")
@@ -68,9 +101,6 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
     total_handover_active = schedule_costs.addVars(time_range, vtype=gp.GRB.INTEGER, name=f"total_handover")
     handover_needed = schedule_costs.addVars(time_range, vtype=gp.GRB.INTEGER, name=f"handover_needed")
 
-    #variable for costs
-    salary_per_interval = schedule_costs.addVars(time_range, vtype=gp.GRB.CONTINUOUS, name="salary_per_interval")
-
     # Start time variable
     start_interval_var = schedule_costs.addVars(tasks_df.index,
         vtype=gp.GRB.INTEGER,
@@ -90,56 +120,66 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
             # A make sure nurse is active if shift is scheduled
             schedule_costs.addConstr(
                 nurse_active_at_time[shift_id, t] <= shift_scheduled[shift_id],
+                name=f"nurse_active_scheduled_{shift_id}_{t}"
             )
 
             # B make sure nurse is inactive before start and can be active after start shift
             schedule_costs.addConstr(
-                t * nurse_active_at_time[shift_id, t] >= shift_df.loc[shift_id, 'Start'] * nurse_active_at_time[shift_id, t]
+                t * nurse_active_at_time[shift_id, t] >= shift_df.loc[shift_id, 'Start'] * nurse_active_at_time[shift_id, t],
+                name=f"nurse_active_start_{shift_id}_{t}"
             )
 
             # C make sure nurse is inactive after end and can be active before end shift 
             schedule_costs.addConstr(
-                (shift_df.loc[shift_id, 'End'] - 1) * nurse_active_at_time[shift_id, t] >= t * nurse_active_at_time[shift_id, t]
+                (shift_df.loc[shift_id, 'End'] - 1) * nurse_active_at_time[shift_id, t] >= t * nurse_active_at_time[shift_id, t],
+                name=f"nurse_active_end_{shift_id}_{t}"
             )
 
             # D ensure nurse can be scheduled for midnight crossover shifts  --> Mandatory?
             if shift_df.loc[shift_id, 'Day'] <= shift_df.loc[shift_id, 'day_end']:
                 schedule_costs.addConstr(
-                    nurse_active_at_time[shift_id, t] == nurse_active_at_time[shift_id, t]
+                    nurse_active_at_time[shift_id, t] == nurse_active_at_time[shift_id, t],
+                    name=f"nurse_active_crossover_{shift_id}_{t}"
                 )
 
             # E Ensure nurses are active for their entire shift duration 
             schedule_costs.addConstr(
                 gp.quicksum(nurse_active_at_time[shift_id, t] for t in range(shift_df.loc[shift_id, 'Start'], shift_df.loc[shift_id, 'End'])) == 
-                (shift_df.loc[shift_id, 'End'] - shift_df.loc[shift_id, 'Start']) * shift_scheduled[shift_id]
-            )
-            
-        # Make sure each nurse works between 4 and 5 shifts if scheduled at all
-        for nurse in shift_df['Nurse_ID'].unique():
-            nurse_shifts = shift_df[shift_df['Nurse_ID'] == nurse].index
-            
-            # Add a variable to track if nurse is used at all
-            nurse_used = schedule_costs.addVar(vtype=gp.GRB.BINARY, name=f"nurse_used_{nurse}")
-            
-            # F Make sure binary nurse_used is zero if not scheduled
-            schedule_costs.addConstr(
-                nurse_used <= gp.quicksum(shift_scheduled[i] for i in nurse_shifts)
+                (shift_df.loc[shift_id, 'End'] - shift_df.loc[shift_id, 'Start']) * shift_scheduled[shift_id],
+                name=f"nurse_active_duration_{shift_id}"
             )
 
-            # G Make sure binary nurse_used is one if scheduled
-            schedule_costs.addConstr(
-                nurse_used * len(nurse_shifts) >= gp.quicksum(shift_scheduled[i] for i in nurse_shifts)
-            )
+    # Make sure each nurse works between 4 and 5 shifts if scheduled at all, built once per nurse
+    nurse_shift_index = shift_df.groupby('Nurse_ID', sort=False).groups
+    for nurse, nurse_shifts in nurse_shift_index.items():
+        shifts_worked = gp.quicksum(shift_scheduled[i] for i in nurse_shifts)
 
-            # H Make sure nurse has at least 4 shifts when scheduled
-            schedule_costs.addConstr(
-                gp.quicksum(shift_scheduled[i] for i in nurse_shifts) >= min_shift_per_week * nurse_used
-            )
+        # Add a variable to track if nurse is used at all
+        nurse_used = schedule_costs.addVar(vtype=gp.GRB.BINARY, name=f"nurse_used_{nurse}")
 
-            # I Make sure nurse has at most 5 shifts when scheduled
-            schedule_costs.addConstr(
-                gp.quicksum(shift_scheduled[i] for i in nurse_shifts) <= max_shifts_per_week * nurse_used
-            )
+        # F Make sure binary nurse_used is zero if not scheduled
+        schedule_costs.addConstr(
+            nurse_used <= shifts_worked,
+            name=f"nurse_used_lower_{nurse}"
+        )
+
+        # G Make sure binary nurse_used is one if scheduled
+        schedule_costs.addConstr(
+            nurse_used * len(nurse_shifts) >= shifts_worked,
+            name=f"nurse_used_upper_{nurse}"
+        )
+
+        # H Make sure nurse has at least 4 shifts when scheduled
+        schedule_costs.addConstr(
+            shifts_worked >= min_shift_per_week * nurse_used,
+            name=f"min_shifts_week_{nurse}"
+        )
+
+        # I Make sure nurse has at most 5 shifts when scheduled
+        schedule_costs.addConstr(
+            shifts_worked <= max_shifts_per_week * nurse_used,
+            name=f"max_shifts_week_{nurse}"
+        )
 
 
     # 2 break related constraints
@@ -153,37 +193,44 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
             # A make sure break is inactive before start window and can be active after start break
             schedule_costs.addConstr(
                 t * break_active[shift_id, t] >= break_window_start * break_active[shift_id, t] * shift_scheduled[shift_id],
+                name=f"break_window_start_{shift_id}_{t}"
             )
 
             # B make sure break is inactive after end window and can be active before end break
             schedule_costs.addConstr(
                 t * break_active[shift_id, t] <= break_window_end * break_active[shift_id, t] * shift_scheduled[shift_id],
+                name=f"break_window_end_{shift_id}_{t}"
             )
 
             # C break is inactive before actual break start and can be active after actual break start   
             schedule_costs.addConstr(
-                t * break_active[shift_id, t] >= break_start_time[shift_id] * break_active[shift_id, t]
+                t * break_active[shift_id, t] >= break_start_time[shift_id] * break_active[shift_id, t],
+                name=f"break_active_start_{shift_id}_{t}"
             )
 
             # D break is inactive after actual break end and can be active before actual break end
             schedule_costs.addConstr(
-                t * break_active[shift_id, t] <= break_end_time[shift_id] * break_active[shift_id, t]
+                t * break_active[shift_id, t] <= break_end_time[shift_id] * break_active[shift_id, t],
+                name=f"break_active_end_{shift_id}_{t}"
             )
 
         # E Ensure break is active for its duration
         schedule_costs.addConstr(
             gp.quicksum(break_active[shift_id, t] for t in time_range) == break_duration * shift_scheduled[shift_id],
+            name=f"break_duration_{shift_id}"
         )
 
         # F Link start break and end break with duration
         schedule_costs.addConstr(
             break_end_time[shift_id] - break_start_time[shift_id] == break_duration - 1 * shift_scheduled[shift_id],
+            name=f"break_end_time_{shift_id}"
         )
 
         # G ensure break is only active for shifts that are scheduled
         for t in time_range:
             schedule_costs.addConstr(
                 break_active[shift_id, t] <= shift_scheduled[shift_id],
+                name=f"break_scheduled_{shift_id}_{t}"
             )
 
     
@@ -192,6 +239,7 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
         schedule_costs.addConstr(
             all_nurses_active_at_time[t] == gp.quicksum(nurse_active_at_time[shift_id, t] for shift_id in shift_df.index)- 
             gp.quicksum(break_active[shift_id, t] for shift_id in shift_df.index),
+            name=f"nurses_scheduled_{t}"
         )
 
     # 3 Task related constraints
@@ -202,13 +250,13 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
             # A Task must be inactive before start and can be active after start time
             schedule_costs.addConstr(
                 t * active_tasks[task_id, t] >= start_interval_var[task_id] * active_tasks[task_id, t],
-                name=f"active_task_start_{task_id}{t}"
+                name=f"active_task_start_{task_id}_{t}"
             )
             
             # B Task must be inactive after end time and can be active before end time
             schedule_costs.addConstr(
                 t * active_tasks[task_id, t] <= end_interval_var[task_id] * active_tasks[task_id, t],
-                name=f"active_task_end_{task_id}{t}"
+                name=f"active_task_end_{task_id}_{t}"
             )
 
         # C Ensure task is active for its duration
@@ -257,25 +305,25 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
             # A handover1 must be inactive before start time and can be active after start time
             schedule_costs.addConstr(
                 t * handover1_active[shift_id, t] >= handover1_start_time * handover1_active[shift_id, t],
-                name=f"handover1_end_{shift_id}{t}"
+                name=f"handover1_start_{shift_id}_{t}"
             )
 
             # B handover 1 must be inactive before start time and can be active after start time
             schedule_costs.addConstr(
                 t * handover2_active[shift_id, t] >= handover2_start_time * handover2_active[shift_id, t],
-                name=f"handover2_end_{shift_id}{t}"
+                name=f"handover2_start_{shift_id}_{t}"
             )
             
             # C handover 1 must be inactive after end time and can be active before end time	
             schedule_costs.addConstr(
                 t * handover1_active[shift_id, t] <= handover1_end_time * handover1_active[shift_id, t],
-                name=f"handover1_end_{shift_id}{t}"
+                name=f"handover1_end_{shift_id}_{t}"
             )
 
             # D handover 2 must be inactive after end time and can be active before end time
             schedule_costs.addConstr(
                 t * handover2_active[shift_id, t] <= handover2_end_time * handover2_active[shift_id, t],
-                name=f"handover2_end_{shift_id}{t}"
+                name=f"handover2_end_{shift_id}_{t}"
             )
         
         # E handover1 task is active for its duration (only for handovers in the handover range)
@@ -294,54 +342,64 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
         for t in handover_time_range:
             schedule_costs.addConstr(
                 handover1_active[shift_id, t] <= shift_scheduled[shift_id],
+                name=f"handover1_scheduled_{shift_id}_{t}"
             )
 
         # H ensure handover2 is only active for shifts that are scheduled
         for t in handover_time_range:
             schedule_costs.addConstr(
                 handover2_active[shift_id, t] <= shift_scheduled[shift_id],
+                name=f"handover2_scheduled_{shift_id}_{t}"
             )
 
     for t in handover_time_range:
         # A Calculate the total number of 1_handovers active at each time
         schedule_costs.addConstr(
-            all_handover1_active[t] == gp.quicksum(handover1_active[shift_id, t] for shift_id in shift_df.index)
+            all_handover1_active[t] == gp.quicksum(handover1_active[shift_id, t] for shift_id in shift_df.index),
+            name=f"all_active_handover1_{t}"
         )
 
         # B Calculate the total number of 2_handovers active at each time
         schedule_costs.addConstr(
-            all_handover2_active[t] == gp.quicksum(handover2_active[shift_id, t] for shift_id in shift_df.index)
+            all_handover2_active[t] == gp.quicksum(handover2_active[shift_id, t] for shift_id in shift_df.index),
+            name=f"all_active_handover2_{t}"
         )
 
         # C Calculate the total number of handovers active at each time
         schedule_costs.addConstr(
-            total_handover_active[t] == all_handover1_active[t] + all_handover2_active[t]
+            total_handover_active[t] == all_handover1_active[t] + all_handover2_active[t],
+            name=f"total_handover_{t}"
         )
 
         # D Make sure the binary only_handover1 is 1 if total and all handover 1 are equal
         schedule_costs.addConstr(
-            (1 - only_handover1[t]) <= total_handover_active[t] - all_handover1_active[t]
+            (1 - only_handover1[t]) <= total_handover_active[t] - all_handover1_active[t],
+            name=f"only_handover1_lower_{t}"
         )
 
         # C Make sure the binary only_handover1 is 0 if there are handover2 active
-        M = 50  # Large number
+        M = big_m
         schedule_costs.addConstr(
-            M * (1 - only_handover1[t]) >= all_handover2_active[t]
+            M * (1 - only_handover1[t]) >= all_handover2_active[t],
+            name=f"only_handover1_upper_{t}"
         )
 
         # D Make sure the binary only_handover2 is 1 if total and all handover 2 are equal
         schedule_costs.addConstr(
-            (1 - only_handover2[t]) <= total_handover_active[t] - all_handover2_active[t]
+            (1 - only_handover2[t]) <= total_handover_active[t] - all_handover2_active[t],
+            name=f"only_handover2_lower_{t}"
         )
 
         # E Make sure the binary only_handover2 is 0 if there are handover1 active
         schedule_costs.addConstr(
-            M * (1 - only_handover2[t]) >= all_handover1_active[t]
+            M * (1 - only_handover2[t]) >= all_handover1_active[t],
+            name=f"only_handover2_upper_{t}"
         )
 
         # F Calculate the number of extra nurses that need a handover
         schedule_costs.addConstr(
-            handover_needed[t] == only_handover1[t] * all_handover1_active[t] + only_handover2[t] * all_handover2_active[t]
+            handover_needed[t] == only_handover1[t] * all_handover1_active[t] + only_handover2[t] * all_handover2_active[t],
+            name=f"handover_needed_{t}"
         )
 
     # 5 concluding constraints
@@ -355,12 +413,13 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
     # B make sure there are always more nurses active than needed in total
         schedule_costs.addConstr(
             all_nurses_active_at_time[t] >= nurses_needed[t] + all_handover1_active[t] + all_handover2_active[t] + (1/3 * handover_needed[t]),
-            name=f"nurses_needed_{t}"
+            name=f"nurse_demand_{t}"
         )
 
         # C ensure that the number of nurses active is at least 2 at all times
         schedule_costs.addConstr(
-            all_nurses_active_at_time[t] >= 2
+            all_nurses_active_at_time[t] >= 2,
+            name=f"min_nurses_{t}"
         )
     
     # Create variables for total nurses present and active at each interval
@@ -369,87 +428,551 @@ def model_start(tasks_df, shift_df, day_salary, night_salary, time_limit):
     total_interval_nurses_active = schedule_costs.addVar(vtype=gp.GRB.INTEGER, name="total_nurses_active")
     # Add constraints to calculate totals across all intervals and shifts
     schedule_costs.addConstr(
-        total_interval_nurses_present == gp.quicksum(all_nurses_active_at_time[t] for t in time_range)
+        total_interval_nurses_present == gp.quicksum(all_nurses_active_at_time[t] for t in time_range),
+        name="total_nurses_present"
     )
     schedule_costs.addConstr(
-        total_interval_nurses_with_tasks == gp.quicksum(nurses_needed[t] for t in time_range)
+        total_interval_nurses_with_tasks == gp.quicksum(nurses_needed[t] for t in time_range),
+        name="total_nurses_tasks"
     )
     schedule_costs.addConstr(
-        total_interval_nurses_active == gp.quicksum(nurses_needed[t] + all_handover1_active[t] + all_handover2_active[t] + (1/3 * handover_needed[t]) for t in time_range)
+        total_interval_nurses_active == gp.quicksum(nurses_needed[t] + all_handover1_active[t] + all_handover2_active[t] + (1/3 * handover_needed[t]) for t in time_range),
+        name="total_nurses_active"
     )
 
 
 
-    # D Calculate the total salary per interval
-    # Night shifts (00:00-07:00)
-    for t in time_range:
-        if t % 96 < 28:  # First 7 hours of each day
-            schedule_costs.addConstr(
-                salary_per_interval[t] == gp.quicksum(nurse_active_at_time[shift_id, t] * (night_salary/4) for shift_id in shift_df.index)
-            )
-        # Day shifts (07:00-18:00)
-        elif t % 96 < 72:  # Next 11 hours of each day
-            schedule_costs.addConstr(
-                salary_per_interval[t] == gp.quicksum(nurse_active_at_time[shift_id, t] * (day_salary/4) for shift_id in shift_df.index)
-            )
-        # Night shifts (18:00-00:00)
-        else:  # Last 6 hours of each day
-            schedule_costs.addConstr(
-                salary_per_interval[t] == gp.quicksum(nurse_active_at_time[shift_id, t] * (night_salary/4) for shift_id in shift_df.index)
-            )
+    # D every shift costs the rates of the intervals in its window, per-day costs follow from the solution
+    shift_cost = shift_costs(shift_df, interval_rates(day_salary, night_salary, rate_table))
 
-    
+    # Objective function
+    schedule_costs.setObjective(gp.quicksum(shift_cost[shift_id] * shift_scheduled[shift_id] for shift_id in shift_df.index), gp.GRB.MINIMIZE)
+    return schedule_costs
 
-    # E total salary per day
-    monday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_monday")
-    schedule_costs.addConstr(
-        monday_salary == gp.quicksum(salary_per_interval[t] for t in monday_intervals)
+def _window_matrix(mask):
+    """Sparse matrix summing a (rows x time) block of variables over a boolean mask per row"""
+    rows, cols = np.nonzero(mask)
+    return sp.csr_matrix(
+        (np.ones(len(rows)), (rows, rows * mask.shape[1] + cols)),
+        shape=(mask.shape[0], mask.size)
     )
 
-    tuesday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_tuesday") 
-    schedule_costs.addConstr(
-        tuesday_salary == gp.quicksum(salary_per_interval[t] for t in tuesday_intervals)
+def _add_interval_vars(model, mask, vtype, name):
+    """Add variables for the (row, interval) pairs of a mask, returns the flat variables with their rows and intervals"""
+    rows, cols = np.nonzero(mask)
+    if mask.all():
+        variables = model.addMVar(mask.shape, vtype=vtype, name=name).reshape(-1)
+    else:
+        variables = model.addMVar(len(rows), vtype=vtype, name=[f"{name}[{row},{col}]" for row, col in zip(rows, cols)])
+    return variables, rows, cols
+
+def _pair_matrix(index, size, values=None, select=None):
+    """Sparse (size x pairs) matrix that sums pair variables per row or per interval"""
+    values = np.ones(len(index)) if values is None else values
+    if select is not None:
+        values = np.where(select, values, 0.0)
+    matrix = sp.csr_matrix((values, (index, np.arange(len(index)))), shape=(size, len(index)))
+    matrix.eliminate_zeros()
+    return matrix
+
+def _pulse_matrix(start, duration, size, values=None):
+    """Sparse (size x pairs) matrix that spreads each start indicator over [start, start + duration)"""
+    values = np.ones(len(start)) if values is None else values
+    length = np.asarray(duration, dtype=int)
+    pair = np.repeat(np.arange(len(start)), length)
+    offset = np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length)
+    return sp.csr_matrix(
+        (np.repeat(values, length), (np.repeat(start, length) + offset, pair)),
+        shape=(size, len(start))
     )
 
-    wednesday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_wednesday")
-    schedule_costs.addConstr(
-        wednesday_salary == gp.quicksum(salary_per_interval[t] for t in wednesday_intervals)
-    )
+@profiling.profile('model_start_matrix')
+def model_start_matrix(tasks_df, shift_df, day_salary, night_salary, time_limit, formulation='full', rate_table=None, inline_aggregates=False, fixed_task_start=None):
+    """Build the same model as model_start with the matrix API and sparse coefficient matrices.
+
+    Rows that model_start adds more than once (constraint 1E per interval, the weekly
+    nurse block per shift) are added once and the empty rows of constraint 1D are skipped.
+    The 'reduced' formulation drops nurse_active and counts every scheduled shift as active
+    over its [Start, End) window in the coverage and salary constraints. The 'windowed'
+    formulation also creates task, break and handover variables only inside the intervals
+    they can occupy and drops the window constraints that are implied by that. The 'pulse'
+    formulation replaces the task and break variables by binary start indicators per feasible
+    start time, so activity is a sliding window sum and the whole model is linear.
+    With inline_aggregates the per-interval counts of scheduled nurses, task demand and
+    handovers and the weekly totals are not variables, their sums enter the coverage rows
+    directly and activity_measures recomputes them from the solution.
+    With fixed_task_start (one start interval per task) the tasks are already placed: their
+    demand is a constant on the right-hand side of the coverage rows and only the start and
+    end times stay, as fixed columns for the output pages.
+    """
+    schedule_costs = gp.Model("NurseScheduling")
 
-    thursday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_thursday")
-    schedule_costs.addConstr(
-        thursday_salary == gp.quicksum(salary_per_interval[t] for t in thursday_intervals)
+    # Model parameters
+    schedule_costs.setParam('OutputFlag', 1)
+    schedule_costs.setParam('TimeLimit', time_limit)
+
+    n_shifts = len(shift_df.index)
+    n_tasks = len(tasks_df.index)
+    n_times = len(time_range)
+    nurses = shift_df['Nurse_ID'].unique()
+
+    times = np.arange(n_times, dtype=float)
+    shift_start = shift_df['Start'].to_numpy(dtype=float)
+    shift_end = shift_df['End'].to_numpy(dtype=float)
+    task_start = tasks_df['Start'].to_numpy(dtype=float)
+    task_end = tasks_df['End'].to_numpy(dtype=float)
+    task_duration = tasks_df['Duration (interval)'].to_numpy(dtype=float)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    in_handover_range = (times >= handover_start) & (times < handover_end)
+    windowed = formulation in ('windowed', 'pulse')
+    pulse = formulation == 'pulse'
+    fixed = fixed_task_start is not None
+
+    # sparse building blocks
+    eye_t = sp.identity(n_times, format='csr')
+    eye_s = sp.identity(n_shifts, format='csr')
+
+    # variables for shift scheduling
+    shift_scheduled = schedule_costs.addMVar(n_shifts, vtype=gp.GRB.BINARY, name="shift_scheduled")
+    if formulation == 'full':
+        nurse_active_at_time = schedule_costs.addMVar((n_shifts, n_times), vtype=gp.GRB.BINARY, name="nurse_active")
+    if not inline_aggregates:
+        all_nurses_active_at_time = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="nurses_scheduled")
+    works_shifts = schedule_costs.addMVar(len(nurses), vtype=gp.GRB.BINARY, name=[f"works_shifts_{i}" for i in range(len(nurses))])
+
+    # variables for break scheduling
+    break_window_start = shift_start + 14
+    break_window_end = shift_start + 21
+    if pulse:
+        # break_start[s, t] is one if the break of shift s starts at interval t
+        break_mask = (times[None, :] >= break_window_start[:, None]) & (times[None, :] <= break_window_end[:, None] - (break_duration - 1))
+        break_mask &= times[None, :] <= n_times - break_duration
+        b, b_shift, b_time = _add_interval_vars(schedule_costs, break_mask, gp.GRB.BINARY, "break_start")
+        break_activity = _pulse_matrix(b_time, np.full(b.size, break_duration), n_times)
+    else:
+        break_start_time = schedule_costs.addMVar(n_shifts, vtype=gp.GRB.INTEGER, name="break_start_time")
+        break_end_time = schedule_costs.addMVar(n_shifts, vtype=gp.GRB.INTEGER, name="break_end_time")
+        break_mask = np.ones((n_shifts, n_times), dtype=bool)
+        if windowed:
+            break_mask = (times[None, :] >= break_window_start[:, None]) & (times[None, :] <= break_window_end[:, None])
+        b, b_shift, b_time = _add_interval_vars(schedule_costs, break_mask, gp.GRB.BINARY, "break_active")
+        break_activity = _pair_matrix(b_time, n_times)
+
+    # variables for task execution
+    if fixed:
+        # placed tasks need no variables, their demand per interval is a constant
+        fixed_start = np.asarray(fixed_task_start, dtype=int)
+        fixed_demand = np.asarray(_pulse_matrix(fixed_start, task_duration, n_times, values=task_nurses).sum(axis=1)).ravel()
+    elif pulse:
+        # task_start[i, t] is one if task i starts at interval t
+        task_mask = (times[None, :] >= task_start[:, None]) & (times[None, :] <= task_end[:, None])
+        task_mask &= times[None, :] <= (n_times - task_duration)[:, None]
+        a, a_task, a_time = _add_interval_vars(schedule_costs, task_mask, gp.GRB.BINARY, "task_start")
+        task_demand = _pulse_matrix(a_time, task_duration[a_task], n_times, values=task_nurses[a_task])
+    else:
+        task_mask = np.ones((n_tasks, n_times), dtype=bool)
+        if windowed:
+            task_mask = (times[None, :] >= task_start[:, None]) & (times[None, :] < (task_end + task_duration)[:, None])
+        a, a_task, a_time = _add_interval_vars(schedule_costs, task_mask, gp.GRB.BINARY, "active_tasks")
+        task_demand = _pair_matrix(a_time, n_times, values=task_nurses[a_task])
+    if not inline_aggregates and not fixed:
+        nurses_needed = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="nurses_needed")
+
+    # variables for handover, handover 1 covers the first two and handover 2 the last two intervals of a shift
+    handover1_start_time = shift_start
+    handover1_end_time = shift_start + 1
+    handover2_start_time = shift_end - 2
+    handover2_end_time = shift_end - 1
+    handover1_mask = np.ones((n_shifts, n_times), dtype=bool)
+    handover2_mask = np.ones((n_shifts, n_times), dtype=bool)
+    if windowed:
+        handover1_mask = (times[None, :] >= handover1_start_time[:, None]) & (times[None, :] <= handover1_end_time[:, None]) & in_handover_range
+        handover2_mask = (times[None, :] >= handover2_start_time[:, None]) & (times[None, :] <= handover2_end_time[:, None]) & in_handover_range
+    h1, h1_shift, h1_time = _add_interval_vars(schedule_costs, handover1_mask, gp.GRB.BINARY, "handover1_active")
+    h2, h2_shift, h2_time = _add_interval_vars(schedule_costs, handover2_mask, gp.GRB.BINARY, "handover2_active")
+    only_handover1 = schedule_costs.addMVar(n_times, vtype=gp.GRB.BINARY, name="only_handover1")
+    only_handover2 = schedule_costs.addMVar(n_times, vtype=gp.GRB.BINARY, name="only_handover2")
+
+    # summing variables for handover
+    if not inline_aggregates:
+        all_handover1_active = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="all_active_handover1")
+        all_handover2_active = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="all_active_handover2")
+        total_handover_active = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="total_handover")
+    handover_needed = schedule_costs.addMVar(n_times, vtype=gp.GRB.INTEGER, name="handover_needed")
+
+    # Start and end time variables
+    if fixed:
+        fixed_end = fixed_start + task_duration - 1
+        start_interval_var = schedule_costs.addMVar(n_tasks, lb=fixed_start, ub=fixed_start, vtype=gp.GRB.INTEGER, name="start_interval_day")
+        end_interval_var = schedule_costs.addMVar(n_tasks, lb=fixed_end, ub=fixed_end, vtype=gp.GRB.INTEGER, name="end_interval_day")
+    else:
+        start_interval_var = schedule_costs.addMVar(n_tasks, vtype=gp.GRB.INTEGER, name="start_interval_day")
+        end_interval_var = schedule_costs.addMVar(n_tasks, vtype=gp.GRB.INTEGER, name="end_interval_day")
+
+    y = shift_scheduled
+    shift_window = (times[None, :] >= shift_start[:, None]) & (times[None, :] < shift_end[:, None])
+
+    # 1 shift related constraints
+    if formulation == 'full':
+        x = nurse_active_at_time.reshape(-1)
+        sum_shifts = sp.kron(np.ones((1, n_shifts)), eye_t, format='csr')
+        per_shift = sp.kron(eye_s, np.ones((n_times, 1)), format='csr')
+
+        # A make sure nurse is active if shift is scheduled
+        schedule_costs.addMConstr(sp.hstack([sp.identity(x.size), -per_shift], format='csr'), gp.hstack([x, y]), '<', np.zeros(x.size), name="nurse_active_scheduled")
+
+        # B make sure nurse is inactive before start and can be active after start shift
+        schedule_costs.addMConstr(sp.diags((times[None, :] - shift_start[:, None]).ravel(), format='csr'), x, '>', np.zeros(x.size), name="nurse_active_start")
+
+        # C make sure nurse is inactive after end and can be active before end shift
+        schedule_costs.addMConstr(sp.diags((shift_end[:, None] - 1 - times[None, :]).ravel(), format='csr'), x, '>', np.zeros(x.size), name="nurse_active_end")
+
+        # E Ensure nurses are active for their entire shift duration
+        schedule_costs.addMConstr(
+            sp.hstack([_window_matrix(shift_window), -sp.diags(shift_end - shift_start)], format='csr'),
+            gp.hstack([x, y]), '=', np.zeros(n_shifts), name="nurse_active_duration"
+        )
+
+        # number of active nurses per interval in terms of nurse_active
+        shift_activity, shift_columns = sum_shifts, x
+    else:
+        # number of active nurses per interval in terms of shift_scheduled over each shift window
+        shift_activity, shift_columns = sp.csr_matrix(shift_window.T, dtype=float), y
+
+    # Make sure each nurse works between 4 and 5 shifts if scheduled at all
+    nurse_used = schedule_costs.addMVar(len(nurses), vtype=gp.GRB.BINARY, name=[f"nurse_used_{nurse}" for nurse in nurses])
+    nurse_shifts = sp.csr_matrix(shift_df['Nurse_ID'].to_numpy()[None, :] == nurses[:, None], dtype=float)
+    shifts_per_nurse = np.asarray(nurse_shifts.sum(axis=1)).ravel()
+    eye_n = sp.identity(len(nurses), format='csr')
+    nurse_vars = gp.hstack([nurse_used, y])
+
+    # F Make sure binary nurse_used is zero if not scheduled
+    schedule_costs.addMConstr(sp.hstack([eye_n, -nurse_shifts], format='csr'), nurse_vars, '<', np.zeros(len(nurses)), name="nurse_used_lower")
+
+    # G Make sure binary nurse_used is one if scheduled
+    schedule_costs.addMConstr(sp.hstack([sp.diags(shifts_per_nurse), -nurse_shifts], format='csr'), nurse_vars, '>', np.zeros(len(nurses)), name="nurse_used_upper")
+
+    # H Make sure nurse has at least 4 shifts when scheduled
+    schedule_costs.addMConstr(sp.hstack([-min_shift_per_week * eye_n, nurse_shifts], format='csr'), nurse_vars, '>', np.zeros(len(nurses)), name="min_shifts_week")
+
+    # I Make sure nurse has at most 5 shifts when scheduled
+    schedule_costs.addMConstr(sp.hstack([-max_shifts_per_week * eye_n, nurse_shifts], format='csr'), nurse_vars, '<', np.zeros(len(nurses)), name="max_shifts_week")
+
+    # 2 break related constraints
+    if pulse:
+        # E Ensure every scheduled shift has exactly one break start
+        schedule_costs.addMConstr(
+            sp.hstack([_pair_matrix(b_shift, n_shifts), -eye_s], format='csr'),
+            gp.hstack([b, y]), '=', np.zeros(n_shifts), name="break_start_once"
+        )
+    else:
+        b_times = b_time.astype(float)
+        if not windowed:
+            # A make sure break is inactive before start window and can be active after start break
+            schedule_costs.addConstr(b * (b_times - break_window_start[b_shift] * y[b_shift]) >= 0, name="break_window_start")
+
+            # B make sure break is inactive after end window and can be active before end break
+            schedule_costs.addConstr(b * (b_times - break_window_end[b_shift] * y[b_shift]) <= 0, name="break_window_end")
+
+        # C break is inactive before actual break start and can be active after actual break start
+        schedule_costs.addConstr(b * (b_times - break_start_time[b_shift]) >= 0, name="break_active_start")
+
+        # D break is inactive after actual break end and can be active before actual break end
+        schedule_costs.addConstr(b * (b_times - break_end_time[b_shift]) <= 0, name="break_active_end")
+
+        # E Ensure break is active for its duration
+        schedule_costs.addMConstr(
+            sp.hstack([_pair_matrix(b_shift, n_shifts), -break_duration * eye_s], format='csr'),
+            gp.hstack([b, y]), '=', np.zeros(n_shifts), name="break_duration"
+        )
+
+        # F Link start break and end break with duration
+        schedule_costs.addMConstr(
+            sp.hstack([eye_s, -eye_s, eye_s], format='csr'),
+            gp.hstack([break_end_time, break_start_time, y]), '=', np.full(n_shifts, break_duration), name="break_end_time"
+        )
+
+    # G ensure break is only active for shifts that are scheduled
+    schedule_costs.addMConstr(
+        sp.hstack([sp.identity(b.size), -_pair_matrix(b_shift, n_shifts).T], format='csr'),
+        gp.hstack([b, y]), '<', np.zeros(b.size), name="break_scheduled"
     )
 
-    friday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_friday")
-    schedule_costs.addConstr(
-        friday_salary == gp.quicksum(salary_per_interval[t] for t in friday_intervals)
+    # H calculate the total scheduled nurses at each time
+    scheduled_matrix = sp.hstack([shift_activity, -break_activity], format='csr')
+    scheduled_vars = gp.hstack([shift_columns, b])
+    if not inline_aggregates:
+        schedule_costs.addMConstr(
+            sp.hstack([eye_t, -scheduled_matrix], format='csr'),
+            gp.hstack([all_nurses_active_at_time, scheduled_vars]), '=', np.zeros(n_times), name="nurses_scheduled"
+        )
+
+    # 3 Task related constraints
+    # placed tasks have no task rows, their start and end columns are fixed by their bounds
+    if not fixed:
+        eye_k = sp.identity(n_tasks, format='csr')
+
+        if pulse:
+            # C Ensure every task starts exactly once inside its window
+            schedule_costs.addMConstr(_pair_matrix(a_task, n_tasks), a, '=', np.ones(n_tasks), name="task_start_once")
+
+            # E/F Start time is the start indicator that is chosen
+            schedule_costs.addMConstr(
+                sp.hstack([eye_k, -_pair_matrix(a_task, n_tasks, values=a_time.astype(float))], format='csr'),
+                gp.hstack([start_interval_var, a]), '=', np.zeros(n_tasks), name="task_start_time"
+            )
+        else:
+            a_times = a_time.astype(float)
+
+            # A Task must be inactive before start and can be active after start time
+            schedule_costs.addConstr(a * (a_times - start_interval_var[a_task]) >= 0, name="active_task_start")
+
+            # B Task must be inactive after end time and can be active before end time
+            schedule_costs.addConstr(a * (a_times - end_interval_var[a_task]) <= 0, name="active_task_end")
+
+            # C Ensure task is active for its duration
+            schedule_costs.addMConstr(_pair_matrix(a_task, n_tasks), a, '=', task_duration, name="task_duration")
+
+        # D Link start and end times with duration
+        schedule_costs.addMConstr(
+            sp.hstack([eye_k, -eye_k], format='csr'),
+            gp.hstack([end_interval_var, start_interval_var]), '=', task_duration - 1, name="duration_constraint"
+        )
+
+        if not pulse:
+            # E Start Task must happen after start window
+            schedule_costs.addMConstr(eye_k, start_interval_var, '>', task_start, name="start_time_constraint_lower")
+
+            # F Start Task must happen before end window
+            schedule_costs.addMConstr(eye_k, start_interval_var, '<', task_end, name="start_time_constraint_upper")
+
+    # 4 handover related constraints
+    # check whether handover is missed with a boolean variable
+    handover1_happening = handover1_end_time > handover_start
+    handover2_happening = handover2_end_time < handover_end
+
+    # only handover variables inside the handover range are constrained
+    h1_in_range = in_handover_range[h1_time]
+    h2_in_range = in_handover_range[h2_time]
+
+    if not windowed:
+        # A handover1 must be inactive before start time and can be active after start time
+        schedule_costs.addMConstr(
+            sp.diags(h1_time - handover1_start_time[h1_shift], format='csr')[h1_in_range],
+            h1, '>', np.zeros(h1_in_range.sum()), name="handover1_start"
+        )
+
+        # B handover 2 must be inactive before start time and can be active after start time
+        schedule_costs.addMConstr(
+            sp.diags(h2_time - handover2_start_time[h2_shift], format='csr')[h2_in_range],
+            h2, '>', np.zeros(h2_in_range.sum()), name="handover2_start"
+        )
+
+        # C handover 1 must be inactive after end time and can be active before end time
+        schedule_costs.addMConstr(
+            sp.diags(handover1_end_time[h1_shift] - h1_time, format='csr')[h1_in_range],
+            h1, '>', np.zeros(h1_in_range.sum()), name="handover1_end"
+        )
+
+        # D handover 2 must be inactive after end time and can be active before end time
+        schedule_costs.addMConstr(
+            sp.diags(handover2_end_time[h2_shift] - h2_time, format='csr')[h2_in_range],
+            h2, '>', np.zeros(h2_in_range.sum()), name="handover2_end"
+        )
+
+    # E handover1 task is active for its duration (only for handovers in the handover range)
+    schedule_costs.addMConstr(
+        sp.hstack([_pair_matrix(h1_shift, n_shifts, select=h1_in_range), -sp.diags(handover_duration * handover1_happening.astype(float))], format='csr'),
+        gp.hstack([h1, y]), '=', np.zeros(n_shifts), name="handover1_duration"
     )
 
-    saturday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_saturday")
-    schedule_costs.addConstr(
-        saturday_salary == gp.quicksum(salary_per_interval[t] for t in saturday_intervals)
+    # F handover2 task is active for its duration (only for handovers in the handover range)
+    schedule_costs.addMConstr(
+        sp.hstack([_pair_matrix(h2_shift, n_shifts, select=h2_in_range), -sp.diags(handover_duration * handover2_happening.astype(float))], format='csr'),
+        gp.hstack([h2, y]), '=', np.zeros(n_shifts), name="handover2_duration"
     )
 
-    sunday_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_sunday")
-    schedule_costs.addConstr(
-        sunday_salary == gp.quicksum(salary_per_interval[t] for t in sunday_intervals)
+    # G ensure handover1 is only active for shifts that are scheduled
+    schedule_costs.addMConstr(
+        sp.hstack([sp.identity(h1.size), -_pair_matrix(h1_shift, n_shifts).T], format='csr')[h1_in_range],
+        gp.hstack([h1, y]), '<', np.zeros(h1_in_range.sum()), name="handover1_scheduled"
     )
-    
-    # Add variable for total salary
-    total_weekly_salary = schedule_costs.addVar(vtype=gp.GRB.CONTINUOUS, name=f"total_salary_week")
-            
-    # F Calculate total salary for the whole week
-    schedule_costs.addConstr(
-        total_weekly_salary == gp.quicksum(salary_per_interval[t] for t in time_range)
+
+    # H ensure handover2 is only active for shifts that are scheduled
+    schedule_costs.addMConstr(
+        sp.hstack([sp.identity(h2.size), -_pair_matrix(h2_shift, n_shifts).T], format='csr')[h2_in_range],
+        gp.hstack([h2, y]), '<', np.zeros(h2_in_range.sum()), name="handover2_scheduled"
     )
 
+    n_handover = in_handover_range.sum()
+    eye_h = sp.identity(n_handover, format='csr')
+    M = big_m
+
+    if inline_aggregates:
+        # A/B the number of active handovers at each time stays a sum over the handover variables
+        handover1_count = _pair_matrix(h1_time, n_times, select=h1_in_range)[in_handover_range]
+        handover2_count = _pair_matrix(h2_time, n_times, select=h2_in_range)[in_handover_range]
+        handover1_terms, handover2_terms = (handover1_count, h1), (handover2_count, h2)
+
+        # D/E only_handover1 is 1 exactly when no handover2 is active and only_handover2 the other way around
+        for only, (count, count_vars), name in ((only_handover1, handover2_terms, "only_handover1"), (only_handover2, handover1_terms, "only_handover2")):
+            only_vars = gp.hstack([count_vars, only[in_handover_range]])
+            schedule_costs.addMConstr(sp.hstack([count, eye_h], format='csr'), only_vars, '>', np.ones(n_handover), name=f"{name}_lower")
+            schedule_costs.addMConstr(sp.hstack([count, M * eye_h], format='csr'), only_vars, '<', np.full(n_handover, M), name=f"{name}_upper")
+    else:
+        # A Calculate the total number of 1_handovers active at each time
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, -_pair_matrix(h1_time, n_times, select=h1_in_range)[in_handover_range]], format='csr'),
+            gp.hstack([all_handover1_active[in_handover_range], h1]), '=', np.zeros(n_handover), name="all_active_handover1"
+        )
+
+        # B Calculate the total number of 2_handovers active at each time
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, -_pair_matrix(h2_time, n_times, select=h2_in_range)[in_handover_range]], format='csr'),
+            gp.hstack([all_handover2_active[in_handover_range], h2]), '=', np.zeros(n_handover), name="all_active_handover2"
+        )
+
+        # C Calculate the total number of handovers active at each time
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, -eye_h, -eye_h], format='csr'),
+            gp.hstack([total_handover_active[in_handover_range], all_handover1_active[in_handover_range], all_handover2_active[in_handover_range]]),
+            '=', np.zeros(n_handover), name="total_handover"
+        )
+
+        # D Make sure the binary only_handover1 is 1 if total and all handover 1 are equal
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, -eye_h, eye_h], format='csr'),
+            gp.hstack([total_handover_active[in_handover_range], all_handover1_active[in_handover_range], only_handover1[in_handover_range]]),
+            '>', np.ones(n_handover), name="only_handover1_lower"
+        )
+
+        # C Make sure the binary only_handover1 is 0 if there are handover2 active
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, M * eye_h], format='csr'),
+            gp.hstack([all_handover2_active[in_handover_range], only_handover1[in_handover_range]]),
+            '<', np.full(n_handover, M), name="only_handover1_upper"
+        )
+
+        # D Make sure the binary only_handover2 is 1 if total and all handover 2 are equal
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, -eye_h, eye_h], format='csr'),
+            gp.hstack([total_handover_active[in_handover_range], all_handover2_active[in_handover_range], only_handover2[in_handover_range]]),
+            '>', np.ones(n_handover), name="only_handover2_lower"
+        )
+
+        # E Make sure the binary only_handover2 is 0 if there are handover1 active
+        schedule_costs.addMConstr(
+            sp.hstack([eye_h, M * eye_h], format='csr'),
+            gp.hstack([all_handover1_active[in_handover_range], only_handover2[in_handover_range]]),
+            '<', np.full(n_handover, M), name="only_handover2_upper"
+        )
+        handover1_terms = (eye_h, all_handover1_active[in_handover_range])
+        handover2_terms = (eye_h, all_handover2_active[in_handover_range])
+
+    # F Calculate the number of extra nurses that need a handover
+    window = slice(handover_start, handover_end)
+    if pulse:
+        # only_handover1 and only_handover2 are exact indicators, so the products are linearised by case
+        (count1, count1_vars), (count2, count2_vars) = handover1_terms, handover2_terms
+        needed_vars = gp.hstack([handover_needed[window], count1_vars, count2_vars, only_handover1[window], only_handover2[window]])
+        zero_h, zero_1, zero_2 = sp.csr_matrix((n_handover, n_handover)), sp.csr_matrix(count1.shape), sp.csr_matrix(count2.shape)
+        linearised_needed = [
+            ([eye_h, -count1, zero_2, -M * eye_h, zero_h], '>', -M, "handover_needed_only1_lower"),
+            ([eye_h, zero_1, -count2, zero_h, -M * eye_h], '>', -M, "handover_needed_only2_lower"),
+            ([eye_h, -count1, zero_2, M * eye_h, zero_h], '<', M, "handover_needed_only1_upper"),
+            ([eye_h, zero_1, -count2, zero_h, M * eye_h], '<', M, "handover_needed_only2_upper"),
+            ([eye_h, zero_1, zero_2, -M * eye_h, -M * eye_h], '<', 0, "handover_needed_none"),
+        ]
+        for blocks, sense, rhs, name in linearised_needed:
+            schedule_costs.addMConstr(
+                sp.hstack(blocks, format='csr'),
+                needed_vars, sense, np.full(n_handover, float(rhs)), name=name
+            )
+    else:
+        handover1_sum = handover1_count @ h1 if inline_aggregates else all_handover1_active[window]
+        handover2_sum = handover2_count @ h2 if inline_aggregates else all_handover2_active[window]
+        schedule_costs.addConstr(
+            handover_needed[window] - only_handover1[window] * handover1_sum - only_handover2[window] * handover2_sum == 0,
+            name="handover_needed"
+        )
+
+    # 5 concluding constraints
+    if inline_aggregates:
+        # B make sure the scheduled nurses cover the tasks, the handovers and the extra handover nurses at each time
+        demand_blocks = [scheduled_matrix, -_pair_matrix(h1_time, n_times, select=h1_in_range), -_pair_matrix(h2_time, n_times, select=h2_in_range), -1/3 * eye_t]
+        demand_vars = [scheduled_vars, h1, h2, handover_needed]
+        if not fixed:
+            demand_blocks.insert(1, -task_demand)
+            demand_vars.insert(1, a)
+        schedule_costs.addMConstr(
+            sp.hstack(demand_blocks, format='csr'), gp.hstack(demand_vars), '>',
+            fixed_demand if fixed else np.zeros(n_times), name="nurse_demand"
+        )
+
+        # C ensure that the number of nurses active is at least 2 at all times
+        schedule_costs.addMConstr(scheduled_matrix, scheduled_vars, '>', np.full(n_times, 2), name="min_nurses")
+    else:
+        if fixed:
+            # B the placed task demand is the right-hand side of the coverage rows
+            demand_vars = gp.hstack([all_nurses_active_at_time, all_handover1_active, all_handover2_active, handover_needed])
+            schedule_costs.addMConstr(
+                sp.hstack([eye_t, -eye_t, -eye_t, -1/3 * eye_t], format='csr'),
+                demand_vars, '>', fixed_demand, name="nurse_demand"
+            )
+            needed_total = fixed_demand.sum()
+        else:
+            # A Calculate the number of nurses needed for the tasks at each time
+            schedule_costs.addMConstr(
+                sp.hstack([eye_t, -task_demand], format='csr'),
+                gp.hstack([nurses_needed, a]), '=', np.zeros(n_times), name="nurses_needed"
+            )
+
+            # B make sure there are always more nurses active than needed in total
+            demand_vars = gp.hstack([all_nurses_active_at_time, nurses_needed, all_handover1_active, all_handover2_active, handover_needed])
+            schedule_costs.addMConstr(
+                sp.hstack([eye_t, -eye_t, -eye_t, -eye_t, -1/3 * eye_t], format='csr'),
+                demand_vars, '>', np.zeros(n_times), name="nurse_demand"
+            )
+            needed_total = nurses_needed.sum()
+
+        # C ensure that the number of nurses active is at least 2 at all times
+        schedule_costs.addMConstr(eye_t, all_nurses_active_at_time, '>', np.full(n_times, 2), name="min_nurses")
+
+        # Create variables for total nurses present and active at each interval
+        total_interval_nurses_present = schedule_costs.addVar(vtype=gp.GRB.INTEGER, name="total_nurses_present")
+        total_interval_nurses_with_tasks = schedule_costs.addVar(vtype=gp.GRB.INTEGER, name="total_nurses_tasks")
+        total_interval_nurses_active = schedule_costs.addVar(vtype=gp.GRB.INTEGER, name="total_nurses_active")
+        # Add constraints to calculate totals across all intervals and shifts
+        schedule_costs.addConstr(total_interval_nurses_present == all_nurses_active_at_time.sum(), name="total_nurses_present")
+        schedule_costs.addConstr(total_interval_nurses_with_tasks == needed_total, name="total_nurses_tasks")
+        schedule_costs.addConstr(
+            total_interval_nurses_active == needed_total + all_handover1_active.sum() + all_handover2_active.sum() + 1/3 * handover_needed.sum(),
+            name="total_nurses_active"
+        )
+
+    # D every shift costs the rates of the intervals in its window, per-day costs follow from the solution
+    shift_cost = shift_costs(shift_df, interval_rates(day_salary, night_salary, rate_table))
+
     # Objective function
-    schedule_costs.setObjective(total_weekly_salary, gp.GRB.MINIMIZE)
+    schedule_costs.setObjective(shift_cost @ y, gp.GRB.MINIMIZE)
     return schedule_costs
 
-def main(file_path, day_salary, night_salary, type_upload='only', time_limit=300):
-    # Salary zou dan doorgetrokken moeten worden naar de model_start functie
+builders = {
+    'legacy': model_start,
+    'matrix': model_start_matrix,
+}
+
+formulations = ('full', 'reduced', 'windowed', 'pulse')
+
+# formulations without quadratic rows, the only ones the HiGHS backend can solve
+linear_formulations = ('pulse',)
+
+def default_formulation(solver):
+    """Formulation used when none is given, HiGHS only solves the linear pulse formulation"""
+    return 'pulse' if solver == 'highs' else 'full'
+
+def load_data(file_path, type_upload='only'):
+    """Read the Tasks and Personnel sheets and convert them to week intervals"""
     # Read tasks
     tasks_df = pd.read_excel(file_path, sheet_name='Tasks')
 
@@ -504,8 +1027,8 @@ def main(file_path, day_salary, night_salary, type_upload='only', time_limit=300
     shift_df['Start'] = (shift_df['Start'] * 4).astype(int)
     shift_df['End'] = (shift_df['End'] * 4).astype(int)
 
-    # convert when shift_df['End'] == 0 to 96
-    shift_df['End'] = shift_df['End'].apply(lambda x: 96 if x == 0 else x)
+    # convert when shift_df['End'] == 0 to 96, a 00:00-00:00 shift is a day off and stays empty
+    shift_df.loc[(shift_df['End'] == 0) & (shift_df['Start'] != 0), 'End'] = 96
 
      # a whole week has 672 intervals (96 intervals per day) make sure that the tasks are scheduled in the right interval
     shift_df['Start'] = shift_df['Start'] + (shift_df['Day'] - 1) * 96
@@ -532,7 +1055,524 @@ def main(file_path, day_salary, night_salary, type_upload='only', time_limit=300
     # Reset index to make it continuous
     shift_df = shift_df.reset_index(drop=True)
 
-    # Create and solve model
-    model = model_start(tasks_df, shift_df, day_salary, night_salary, time_limit)
-    model.optimize()
+    return tasks_df, shift_df
+
+def filter_shifts(shift_df):
+    """Drop shift rows that cannot be worked and keep their original row in 'shift_row'"""
+    shift_df = shift_df.rename_axis('shift_row').reset_index()
+
+    # shifts running past Sunday midnight end with the week
+    shift_df['End'] = shift_df['End'].clip(upper=len(time_range))
+
+    # off days arrive as zero length shifts (00:00-00:00 or 23:45-23:45)
+    available = (shift_df['Start'] >= 0) & (shift_df['Start'] < len(time_range)) & (shift_df['End'] > shift_df['Start'])
+    return shift_df[available].reset_index(drop=True)
+
+def build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, builder='matrix', formulation='full', rate_table=None, inline_aggregates=False, fixed_task_start=None):
+    """Build the scheduling model with the selected builder and formulation"""
+    if builder not in builders:
+        raise ValueError(f"Unknown builder '{builder}', choose from {list(builders)}")
+    if formulation not in formulations:
+        raise ValueError(f"Unknown formulation '{formulation}', choose from {list(formulations)}")
+    if builder == 'legacy' and formulation != 'full':
+        raise ValueError("The legacy builder only supports the 'full' formulation")
+    if builder == 'legacy' and inline_aggregates:
+        raise ValueError("The legacy builder does not support inline_aggregates")
+    if builder == 'legacy' and fixed_task_start is not None:
+        raise ValueError("The legacy builder does not support fixed_task_start")
+
+    if builder == 'legacy':
+        model = model_start(tasks_df, shift_df, day_salary, night_salary, time_limit, rate_table)
+    else:
+        model = model_start_matrix(tasks_df, shift_df, day_salary, night_salary, time_limit, formulation, rate_table, inline_aggregates, fixed_task_start)
+
+    # keep the input data on the model so the output pages can map the solution back
+    model._formulation = formulation
+    model._shift_df = shift_df
+    model._tasks_df = tasks_df
+    model._interval_rate = interval_rates(day_salary, night_salary, rate_table)
     return model
+
+def compare_builders(file_path, day_salary, night_salary, type_upload='only', time_limit=300):
+    """Build the model with every builder and formulation and report build time and model size"""
+    tasks_df, shift_df = load_data(file_path, type_upload)
+    shift_df = filter_shifts(shift_df)
+    combinations = [(builder, 'full') for builder in builders]
+    combinations += [('matrix', formulation) for formulation in formulations if formulation != 'full']
+
+    rows = []
+    for builder, formulation in combinations:
+        build_start = time.perf_counter()
+        model = build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, builder, formulation)
+        model.update()
+        rows.append({
+            'builder': builder,
+            'formulation': formulation,
+            'build_seconds': time.perf_counter() - build_start,
+            'variables': model.NumVars,
+            'constraints': model.NumConstrs,
+            'quadratic_constraints': model.NumQConstrs,
+            'nonzeros': model.NumNZs,
+        })
+        model.dispose()
+    return pd.DataFrame(rows)
+
+def benchmark_formulations(file_path, day_salary, night_salary, type_upload='only', time_limit=300, formulations=formulations):
+    """Build and solve every formulation on the same instance and report time, objective and size"""
+    tasks_df, shift_df = load_data(file_path, type_upload)
+    shift_df = filter_shifts(shift_df)
+
+    rows = []
+    for formulation in formulations:
+        build_start = time.perf_counter()
+        model = build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', formulation)
+        model.update()
+        build_seconds = time.perf_counter() - build_start
+        model.optimize()
+        rows.append({
+            'formulation': formulation,
+            'build_seconds': build_seconds,
+            'solve_seconds': model.Runtime,
+            'status': model.Status,
+            'objective': model.ObjVal if model.SolCount > 0 else None,
+            'bound': model.ObjBound if model.IsMIP and model.Status != gp.GRB.INFEASIBLE else None,
+            'variables': model.NumVars,
+            'constraints': model.NumConstrs,
+            'quadratic_constraints': model.NumQConstrs,
+            'nonzeros': model.NumNZs,
+        })
+        model.dispose()
+    return pd.DataFrame(rows)
+
+def compare_tightening(file_path, day_salary, night_salary, type_upload='only', time_limit=300, formulations=('pulse',), solver='gurobi'):
+    """Root LP bound of every formulation before and after tighten_model"""
+    tasks_df, shift_df = load_data(file_path, type_upload)
+    shift_df = filter_shifts(shift_df)
+
+    rows = []
+    for formulation in formulations:
+        model = build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', formulation)
+        before = relaxations[solver](model)[0]
+        tighten_start = time.perf_counter()
+        report = tighten_model(model)
+        tighten_seconds = time.perf_counter() - tighten_start
+        after = relaxations[solver](model)[0]
+        rows.append({
+            'formulation': formulation,
+            'tighten_seconds': tighten_seconds,
+            'bounds_changed': report.loc['total', ['lower_raised', 'upper_lowered']].sum(),
+            'big_m_rows': report.loc['total', 'big_m_rows'],
+            'root_bound_before': before,
+            'root_bound_after': after,
+            'root_bound_gain': after - before if before is not None and after is not None else None,
+        })
+        model.dispose()
+    return pd.DataFrame(rows)
+
+@profiling.profile('solution_costs')
+def solution_costs(solution):
+    """Salary per interval and per day of a solved schedule, from shift_scheduled and the interval rates"""
+    shift_df = solution._shift_df
+    scheduled = np.zeros(len(shift_df), dtype=bool)
+    for var in solution.getVars():
+        if var.varName.startswith('shift_scheduled[') and var.x > 0.5:
+            scheduled[int(var.varName.split('[')[1].rstrip(']'))] = True
+
+    present = np.zeros(len(time_range))
+    for start, end in zip(shift_df['Start'].to_numpy(dtype=int)[scheduled], shift_df['End'].to_numpy(dtype=int)[scheduled]):
+        present[start:end] += 1
+    salary = solution._interval_rate * present
+    return salary, salary.reshape(len(weekdays), -1).sum(axis=1)
+
+def set_lower_bound(model, lower_bound, target_gap=None):
+    """Keep the salary lower bound on the model and stop once the incumbent is within target_gap of it
+
+    Gurobi gets the bound as BestObjStop, so it stops as soon as a schedule reaches the bound
+    instead of proving it through branching. A row on the objective was tried as well but made
+    HiGHS slower, so the bound never enters the model itself.
+    """
+    model._lower_bound = lower_bound
+    if target_gap is not None:
+        model.setParam('MIPGap', target_gap)
+    if lower_bound is not None:
+        # a small margin so a schedule that meets the bound up to the solver tolerances also stops the solve
+        model.setParam('BestObjStop', lower_bound * (1 + (target_gap or 0)) + 1e-6 * max(abs(lower_bound), 1))
+
+def solution_gap(solution):
+    """Objective, best lower bound and relative gap of a solved schedule, the bound is the larger of the solver and salary lower bounds"""
+    objective = solution.ObjVal
+    bounds = [bound for bound in (getattr(solution, 'ObjBound', None), getattr(solution, '_lower_bound', None)) if bound is not None]
+    if objective is None or not bounds:
+        return objective, None, None
+    bound = min(max(bounds), objective)
+    return objective, bound, (objective - bound) / max(abs(objective), 1e-10)
+
+@profiling.profile('activity_measures')
+def activity_measures(solution):
+    """Nurses scheduled, needed for tasks and handing over per interval and their weekly totals, from a solved schedule
+
+    Works for every formulation and for models built with inline_aggregates, which have no
+    variables for these counts.
+    """
+    shift_df = solution._shift_df
+    tasks_df = solution._tasks_df
+    n_times = len(time_range)
+    values = {var.varName: var.x for var in solution.getVars() if var.varName.startswith(('shift_scheduled[', 'break_', 'start_interval_day[', 'handover1_active[', 'handover2_active['))}
+
+    def pairs(prefix):
+        for name, value in values.items():
+            if name.startswith(prefix) and value > 0.5:
+                row, t = name[len(prefix):].rstrip(']').split(',')
+                yield int(row), int(t)
+
+    # A nurses on shift minus the nurses on break, a break_start indicator covers the whole break
+    scheduled = np.array([values.get(f"shift_scheduled[{shift}]", 0) > 0.5 for shift in range(len(shift_df))], dtype=bool)
+    present = np.zeros(n_times)
+    for start, end in zip(shift_df['Start'].to_numpy(dtype=int)[scheduled], shift_df['End'].to_numpy(dtype=int)[scheduled]):
+        present[start:end] += 1
+    on_break = np.zeros(n_times)
+    for shift, t in pairs('break_start['):
+        on_break[t:t + break_duration] += 1
+    for shift, t in pairs('break_active['):
+        on_break[t] += 1
+
+    # B task demand from the task start times
+    needed = np.zeros(n_times)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    for task in range(len(tasks_df)):
+        start = int(round(values[f"start_interval_day[{task}]"]))
+        needed[start:start + duration[task]] += task_nurses[task]
+
+    # C handovers only count inside the handover range, a lone handover group needs a third extra nurse
+    handover1 = np.zeros(n_times)
+    handover2 = np.zeros(n_times)
+    for counts, prefix in ((handover1, 'handover1_active['), (handover2, 'handover2_active[')):
+        for shift, t in pairs(prefix):
+            if handover_start <= t < handover_end:
+                counts[t] += 1
+    handover_needed = np.where(handover2 == 0, handover1, 0) + np.where(handover1 == 0, handover2, 0)
+
+    nurses_scheduled = present - on_break
+    return {
+        'nurses_scheduled': nurses_scheduled,
+        'nurses_needed': needed,
+        'handover1': handover1,
+        'handover2': handover2,
+        'handover_needed': handover_needed,
+        'total_nurses_present': nurses_scheduled.sum(),
+        'total_nurses_tasks': needed.sum(),
+        'total_nurses_active': (needed + handover1 + handover2 + handover_needed / 3).sum(),
+    }
+
+def _name_family(name):
+    """Family of a variable or constraint name, the name without its index"""
+    if not name or re.fullmatch(r'[CR]\d+', name):
+        return 'unnamed'
+    return re.sub(r'(_\d+)+(_?day)?$', '', name.split('[')[0])
+
+def model_size_report(model):
+    """Count variables, constraints, nonzeros and quadratic terms per variable and constraint family"""
+    model.update()
+    variables = model.getVars()
+    constraints = model.getConstrs()
+    quadratic_constraints = model.getQConstrs()
+    quadratic_rows = [model.getQCRow(qc) for qc in quadratic_constraints]
+
+    parts = [
+        pd.DataFrame({
+            'family': [_name_family(name) for name in model.getAttr('VarName', variables)],
+            'variables': 1,
+        }),
+        pd.DataFrame({
+            'family': [_name_family(name) for name in model.getAttr('ConstrName', constraints)],
+            'constraints': 1,
+            'nonzeros': np.diff(model.getA().indptr),
+        }),
+    ]
+    if quadratic_constraints:
+        parts.append(pd.DataFrame({
+            'family': [_name_family(name) for name in model.getAttr('QCName', quadratic_constraints)],
+            'quadratic_constraints': 1,
+            'nonzeros': [row.getLinExpr().size() for row in quadratic_rows],
+            'quadratic_terms': [row.size() for row in quadratic_rows],
+        }))
+
+    columns = ['variables', 'constraints', 'quadratic_constraints', 'nonzeros', 'quadratic_terms']
+    report = pd.concat(parts).groupby('family').sum().reindex(columns=columns).fillna(0).astype(int)
+    report.loc['total'] = report.sum()
+    return report
+
+def tighten_model(model):
+    """Set variable bounds from the task and shift windows and shrink every handover big-M to what the interval can reach
+
+    Task and break times get the bounds their window rows imply, so lint_model can drop those rows
+    afterwards. The count variables get the number of shifts or task nurses that can reach their
+    interval as upper bound and the big-M of an interval becomes the largest number of handovers
+    that can happen in it. Rows of aggregated models are weighted by their 'Count'.
+    """
+    model.update()
+    shift_df = model._shift_df
+    tasks_df = model._tasks_df
+    n_times = len(time_range)
+    times = np.arange(n_times)
+    shift_start = shift_df['Start'].to_numpy(dtype=int)
+    shift_end = shift_df['End'].to_numpy(dtype=int)
+    shift_weight = shift_df['Count'].to_numpy(dtype=float) if 'Count' in shift_df else np.ones(len(shift_df))
+    task_start = tasks_df['Start'].to_numpy(dtype=int)
+    task_end = tasks_df['End'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    task_weight = tasks_df['Count'].to_numpy(dtype=float) if 'Count' in tasks_df else np.ones(len(tasks_df))
+
+    # A how many nurses, handovers and task nurses can reach each interval
+    handover1, handover2, allowed = heuristic.handover_windows(shift_df)
+    shift_window = (times[None, :] >= shift_start[:, None]) & (times[None, :] < shift_end[:, None])
+    latest_start = np.minimum(task_end, n_times - duration)
+    task_window = (times[None, :] >= task_start[:, None]) & (times[None, :] < (latest_start + duration)[:, None])
+    present = (shift_window & allowed[:, None]).T @ shift_weight
+    all1 = (handover1 & allowed[:, None]).T @ shift_weight
+    all2 = (handover2 & allowed[:, None]).T @ shift_weight
+    needed = task_window.T @ (tasks_df['# Nurses'].to_numpy(dtype=float) * task_weight)
+    interval_m = np.maximum(np.maximum(all1, all2), 1)
+
+    # B bounds per family, indexed by task, shift or interval
+    bounds = {
+        'start_interval_day': (task_start, latest_start),
+        'end_interval_day': (task_start + duration - 1, latest_start + duration - 1),
+        'break_start_time': (shift_start + 14, shift_start + 20),
+        'break_end_time': (shift_start + 15, shift_start + 22),
+        'nurses_scheduled': (None, present),
+        'nurses_needed': (None, needed),
+        'all_active_handover1': (None, all1),
+        'all_active_handover2': (None, all2),
+        'total_handover': (None, all1 + all2),
+        'handover_needed': (None, np.maximum(all1, all2)),
+    }
+    variables = model.getVars()
+    names = model.getAttr('VarName', variables)
+    lower = np.array(model.getAttr('LB', variables))
+    upper = np.array(model.getAttr('UB', variables))
+    new_lower, new_upper = lower.copy(), upper.copy()
+    families = [name.split('[')[0] for name in names]
+    for i, (name, family) in enumerate(zip(names, families)):
+        if family in bounds and '[' in name:
+            index = int(name.split('[')[1].rstrip(']'))
+            low, high = bounds[family]
+            if low is not None:
+                new_lower[i] = max(lower[i], low[index])
+            new_upper[i] = min(upper[i], high[index])
+    model.setAttr('LB', variables, new_lower.tolist())
+    model.setAttr('UB', variables, new_upper.tolist())
+
+    # C the big-M coefficients and right hand sides of the handover indicator rows, the interval is read from the indicator
+    big_m_families = (
+        'only_handover1_upper', 'only_handover2_upper', 'handover_needed_only1_lower', 'handover_needed_only2_lower',
+        'handover_needed_only1_upper', 'handover_needed_only2_upper', 'handover_needed_none',
+    )
+    constraints = model.getConstrs()
+    A = model.getA().tocsr()
+    rhs = model.getAttr('RHS', constraints)
+    big_m_rows = []
+    for row, name in enumerate(model.getAttr('ConstrName', constraints)):
+        if _name_family(name) not in big_m_families:
+            continue
+        m = big_m
+        columns = A.indices[A.indptr[row]:A.indptr[row + 1]]
+        coefficients = A.data[A.indptr[row]:A.indptr[row + 1]]
+        for column, coefficient in zip(columns, coefficients):
+            if abs(coefficient) == big_m:
+                m = interval_m[int(names[column].split('[')[1].rstrip(']'))]
+                model.chgCoeff(constraints[row], variables[column], np.sign(coefficient) * m)
+        if abs(rhs[row]) == big_m:
+            rhs[row] = np.sign(rhs[row]) * m
+        big_m_rows.append(_name_family(name))
+    model.setAttr('RHS', constraints, rhs)
+    model.update()
+
+    report = pd.concat([
+        pd.DataFrame({
+            'family': families,
+            'lower_raised': (new_lower > lower).astype(int),
+            'upper_lowered': (new_upper < upper).astype(int),
+        }).groupby('family').sum(),
+        pd.Series(big_m_rows, dtype=object).value_counts().rename('big_m_rows'),
+    ], axis=1).fillna(0).astype(int)
+    report = report[report.sum(axis=1) > 0]
+    report.loc['total'] = report.sum()
+    return report
+
+def lint_model(model):
+    """Remove duplicate and trivially satisfied linear constraints and report the removals per family"""
+    model.update()
+    constraints = model.getConstrs()
+    variables = model.getVars()
+    A = model.getA().tocsr()
+    A.eliminate_zeros()
+    A.sort_indices()
+    senses = np.array(model.getAttr('Sense', constraints))
+    rhs = np.array(model.getAttr('RHS', constraints))
+    lower = np.array(model.getAttr('LB', variables))[A.indices]
+    upper = np.array(model.getAttr('UB', variables))[A.indices]
+    names = model.getAttr('ConstrName', constraints)
+
+    # A rows that hold for every value within the variable bounds
+    row_low = np.asarray(sp.csr_matrix((np.where(A.data > 0, A.data * lower, A.data * upper), A.indices, A.indptr), shape=A.shape).sum(axis=1)).ravel()
+    row_high = np.asarray(sp.csr_matrix((np.where(A.data > 0, A.data * upper, A.data * lower), A.indices, A.indptr), shape=A.shape).sum(axis=1)).ravel()
+    tautology = (
+        ((senses == '>') & (row_low >= rhs)) |
+        ((senses == '<') & (row_high <= rhs)) |
+        ((senses == '=') & (row_low == rhs) & (row_high == rhs))
+    )
+
+    # B rows that repeat an earlier row exactly
+    duplicate = np.zeros(len(constraints), dtype=bool)
+    seen = set()
+    for row in np.flatnonzero(~tautology):
+        start, end = A.indptr[row], A.indptr[row + 1]
+        key = (A.indices[start:end].tobytes(), A.data[start:end].tobytes(), senses[row], rhs[row])
+        if key in seen:
+            duplicate[row] = True
+        else:
+            seen.add(key)
+
+    # C names that are still shared by several rows after the removal
+    kept_names = pd.Series(names)[~(tautology | duplicate)]
+    repeated_name = kept_names.duplicated(keep=False).reindex(range(len(names)), fill_value=False).to_numpy()
+
+    model.remove([constraints[row] for row in np.flatnonzero(tautology | duplicate)])
+    model.update()
+
+    report = pd.DataFrame({
+        'family': [_name_family(name) for name in names],
+        'rows': 1,
+        'tautologies': tautology.astype(int),
+        'duplicates': duplicate.astype(int),
+        'repeated_names': repeated_name.astype(int),
+    }).groupby('family').sum()
+    report = report[report[['tautologies', 'duplicates', 'repeated_names']].sum(axis=1) > 0]
+    report.loc['total'] = report.sum()
+    return report
+
+def main(file_path, day_salary, night_salary, type_upload='only', time_limit=300, builder='matrix', formulation=None, size_report=False, lint=True, solver='gurobi', mip_start=True, previous_schedule=None, decompose=False, workers=None, pattern_generation=False, task_placement=None, rate_table=None, inline_aggregates=False, symmetry_reduction=False, tighten=False, feasibility_check=True, lower_bound=None, lower_bound_time_limit=10, target_gap=None, progress=None, threads=None):
+    # HiGHS only solves linear models, without a formulation it gets pulse and a quadratic one is refused before any work
+    formulation = formulation or default_formulation(solver)
+    if solver == 'highs' and formulation not in linear_formulations:
+        raise ValueError(f"The HiGHS backend needs a linear formulation, choose from {list(linear_formulations)}")
+
+    # The split solves build their own models, last week's schedule can only start the single MIP or the heuristic
+    split_solves = {'decompose': decompose, 'pattern_generation': pattern_generation, 'task_placement': task_placement is not None, 'symmetry_reduction': symmetry_reduction}
+    if previous_schedule is not None and any(split_solves.values()):
+        raise ValueError(f"previous_schedule can not be combined with {[name for name, used in split_solves.items() if used]}, it only warm starts the single MIP and the heuristic")
+
+    # Every phase is timed, the record ends up on the result as _telemetry and in the telemetry log
+    run = telemetry.Run(file=getattr(file_path, 'name', str(file_path)), solver=solver, builder=builder, formulation=formulation, time_limit=time_limit)
+
+    # Salary zou dan doorgetrokken moeten worden naar de model_start functie
+    with run.phase('load_data'):
+        tasks_df, shift_df = load_data(file_path, type_upload)
+
+        # Off days and shifts outside the week get no variables at all
+        shift_df = filter_shifts(shift_df)
+
+    # Reject weeks that can not be staffed in milliseconds, the report names the intervals, days and tasks
+    if feasibility_check:
+        with run.phase('feasibility_check'):
+            feasibility_report = feasibility.feasibility_check(tasks_df, shift_df)
+        if not feasibility_report['feasible']:
+            result = ScheduleSolution([], [], gp.GRB.INFEASIBLE, runtime=feasibility_report['seconds'])
+            result._feasibility_report = feasibility_report
+            return run.finish(result)
+
+    # Map last week's schedule by Nurse_ID/Day and task name/Day and repair it into a feasible start
+    initial = schedule = warm_start_report = None
+    if previous_schedule is not None:
+        with run.phase('warm_start'):
+            initial, schedule, warm_start_report = warm_start.warm_start_schedule(previous_schedule, tasks_df, shift_df, day_salary, night_salary, rate_table)
+
+    # Salary lower bound from the cheapest shifts that cover a relaxed staffing profile, a HiGHS MIP of its own capped
+    # at lower_bound_time_limit. By default only the single MIP gets it, where it also stops the solve, lower_bound=True
+    # forces it for the heuristic and the split solves and False skips it
+    single_mip = solver in solvers and not any(split_solves.values())
+    salary_bound = None
+    if lower_bound or (lower_bound is None and single_mip):
+        with run.phase('lower_bound'):
+            salary_bound = feasibility.salary_lower_bound(tasks_df, shift_df, interval_rates(day_salary, night_salary, rate_table), lower_bound_time_limit)
+
+    if solver == 'heuristic':
+        with run.phase('solve'):
+            result = heuristic.heuristic_solution(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+        result._warm_start_report = warm_start_report
+        result._lower_bound = salary_bound
+        return run.finish(result)
+    if solver not in solvers:
+        raise ValueError(f"Unknown solver '{solver}', choose from {list(solvers) + ['heuristic']}")
+    if decompose:
+        # One subproblem per day in a process pool, a master MIP assigns the shifts within the weekly limits
+        with run.phase('solve'):
+            result = decomposition.decomposition_solution(tasks_df, shift_df, day_salary, night_salary, solver, formulation, time_limit, workers, rate_table=rate_table, threads=threads)
+        result._lower_bound = salary_bound
+        return run.finish(result)
+    if pattern_generation:
+        # Weekly patterns per nurse priced from the coverage duals, finished by a restricted-master MIP
+        with run.phase('solve'):
+            result = column_generation.column_generation_solution(tasks_df, shift_df, day_salary, night_salary, solver, time_limit, rate_table=rate_table, threads=threads)
+        result._lower_bound = salary_bound
+        return run.finish(result)
+    if task_placement is not None:
+        # Place the tasks first ('greedy' or 'mip'), then staff the week with a constant demand vector
+        with run.phase('solve'):
+            result = two_stage.two_stage_solution(tasks_df, shift_df, day_salary, night_salary, solver, formulation, time_limit, task_placement, rate_table, threads)
+        result._lower_bound = salary_bound
+        return run.finish(result)
+    if symmetry_reduction:
+        # Nurses with the same availability and identical tasks become counts, mapped back to Nurse_IDs afterwards
+        with run.phase('solve'):
+            result = symmetry.symmetry_solution(tasks_df, shift_df, day_salary, night_salary, solver, time_limit, rate_table, inline_aggregates, threads)
+        result._lower_bound = salary_bound
+        return run.finish(result)
+
+    # Create and solve model, a rate_table of 672 hourly rates replaces the day/night rule
+    with run.phase('build_model'):
+        model = build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, builder, formulation, rate_table, inline_aggregates)
+    if tighten:
+        # Bounds and big-Ms from the windows first, so lint also drops the window rows they make redundant
+        with run.phase('tighten'):
+            model._tighten_report = tighten_model(model)
+    if lint:
+        # Drop dead rows before presolve sees them
+        with run.phase('lint'):
+            model._lint_report = lint_model(model)
+    if size_report:
+        # Per family model size, kept on the model so callers can inspect it next to the solution
+        model._size_report = model_size_report(model)
+    run.model = telemetry.model_stats(model)
+
+    # Gurobi stops once a schedule reaches the bound, a target gap (e.g. 0.01) ends the solve earlier
+    set_lower_bound(model, salary_bound, target_gap)
+    if threads is not None:
+        # The solve queue gives every running job its share of the cores
+        model.setParam('Threads', threads)
+
+    # Seed Gurobi with the greedy or warm started schedule so it has an incumbent from the start
+    with run.phase('mip_start'):
+        if solver != 'gurobi':
+            schedule = None
+        elif schedule is None and mip_start:
+            schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, rate_table=rate_table)
+        if schedule is not None:
+            heuristic.set_mip_start(model, schedule)
+        if initial is not None and solver == 'gurobi':
+            warm_start.set_hints(model, initial)
+    model._warm_start_report = warm_start_report
+
+    # Gurobi reports incumbent, bound, gap and nodes to progress(update), a true reply stops it with the incumbent
+    model._progress = progress
+    with run.phase('solve'):
+        result = solvers[solver](model)
+    if result.SolCount == 0 and schedule is not None:
+        # Gurobi found nothing within the time limit, fall back to the greedy schedule
+        with run.phase('fallback_heuristic'):
+            result = heuristic.heuristic_solution(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+    result._warm_start_report = warm_start_report
+    result._lower_bound = salary_bound
+    return run.finish(result)
@@ -0,0 +1,114 @@
+import os
+import time
+import argparse
+import pandas as pd
+import plotly.express as px
+import gurobipy as gp
+import NRP_OBP_D as nrp
+import instance_generator
+
+sizes = (25, 50, 100, 200, 400)
+
+# main's phases that make up the four columns of the scaling plot, extract is timed here
+phase_columns = {'load_data': 'read_seconds', 'build_model': 'build_seconds', 'solve': 'solve_seconds'}
+
+def configurations(builders=None, formulations=None, solvers=None):
+    """Every (builder, formulation, solver) main can run, the legacy builder only has the full formulation and HiGHS only linear ones"""
+    combinations = [('legacy', 'full')] + [('matrix', formulation) for formulation in nrp.formulations]
+    configs = []
+    for solver in solvers or list(nrp.solvers) + ['heuristic']:
+        if solver == 'heuristic':
+            # the greedy schedule builds no model, builder and formulation do not apply
+            configs.append((None, None, solver))
+            continue
+        configs += [(builder, formulation, solver) for builder, formulation in combinations
+                    if (builders is None or builder in builders) and (formulations is None or formulation in formulations)
+                    and (solver == 'gurobi' or formulation in nrp.linear_formulations)]
+    return configs
+
+def benchmark_run(file_path, day_salary, night_salary, builder, formulation, solver, time_limit):
+    """Times of one call to main and of extracting its schedule, an exception (e.g. a Gurobi licence limit) ends up in error"""
+    row = {'builder': builder, 'formulation': formulation, 'solver': solver, 'error': None}
+    start = time.perf_counter()
+    try:
+        result = nrp.main(file_path, day_salary, night_salary, 'only', time_limit, builder or 'matrix', formulation or 'full', solver=solver)
+    except Exception as e:
+        row.update({'total_seconds': time.perf_counter() - start, 'error': str(e)})
+        return row
+
+    # A the phases main recorded, repeated phases such as a fallback heuristic add up
+    record = result._telemetry
+    for phase in record['phases']:
+        column = phase_columns.get(phase['phase'], f"{phase['phase']}_seconds")
+        row[column] = row.get(column, 0.0) + phase['seconds']
+    row.update({key: record['solve'][key] for key in ('status', 'objective', 'bound', 'gap', 'nodes')})
+    row.update(record['model'] or {})
+
+    # B extract is what the output page needs from a schedule: the salary and activity per interval
+    if result.SolCount > 0:
+        extract_start = time.perf_counter()
+        nrp.solution_costs(result)
+        nrp.activity_measures(result)
+        row['extract_seconds'] = time.perf_counter() - extract_start
+    row['total_seconds'] = time.perf_counter() - start
+    if isinstance(result, gp.Model):
+        result.dispose()
+    return row
+
+def scaling_plot(results, path):
+    """Seconds per phase against the number of nurses, one line per configuration, as an interactive HTML file"""
+    columns = [column for column in ('read_seconds', 'build_seconds', 'solve_seconds', 'extract_seconds') if column in results]
+    data = results.assign(configuration=results[['builder', 'formulation', 'solver']].fillna('-').astype(str).agg('/'.join, axis=1))
+    data = data.melt(id_vars=['nurses', 'configuration'], value_vars=columns, var_name='phase', value_name='seconds').dropna(subset=['seconds'])
+    data['phase'] = data['phase'].str.replace('_seconds', '')
+    fig = px.line(data, x='nurses', y='seconds', color='configuration', facet_col='phase', markers=True, log_x=True, log_y=True,
+                  category_orders={'phase': [column.replace('_seconds', '') for column in columns]},
+                  title='Scaling of read, build, solve and extract with the number of nurses')
+    fig.write_html(path)
+    return fig
+
+def run_benchmark(sizes=sizes, configs=None, day_salary=15, night_salary=20, time_limit=60, seed=0, out_dir='benchmarks', **generator_args):
+    """Generate a week per size and run every configuration on it, results go to benchmark.csv and benchmark_scaling.html
+
+    The CSV is rewritten after every run, so an interrupted benchmark keeps what it measured.
+    generator_args go to instance_generator.generate_instance, e.g. tasks or staffing.
+    """
+    configs = configs or configurations()
+    os.makedirs(os.path.join(out_dir, 'instances'), exist_ok=True)
+    csv_path = os.path.join(out_dir, 'benchmark.csv')
+
+    rows = []
+    for nurses in sizes:
+        file_path = os.path.join(out_dir, 'instances', f"nurses_{nurses}_seed_{seed}.xlsx")
+        instance_generator.write_instance(file_path, nurses=nurses, seed=seed, **generator_args)
+        for builder, formulation, solver in configs:
+            row = {'nurses': nurses, 'seed': seed, 'time_limit': time_limit}
+            row.update(benchmark_run(file_path, day_salary, night_salary, builder, formulation, solver, time_limit))
+            rows.append(row)
+            label = '/'.join(part or '-' for part in (builder, formulation, solver))
+            print(f"{nurses} nurses, {label}: {row['total_seconds']:.2f} s" + (f" ({row['error']})" if row['error'] else ""))
+            pd.DataFrame(rows).to_csv(csv_path, index=False)
+
+    results = pd.DataFrame(rows)
+    scaling_plot(results, os.path.join(out_dir, 'benchmark_scaling.html'))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time read, build, solve and extract of main on generated weeks of growing size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(sizes), help='numbers of nurses')
+    parser.add_argument('--builders', nargs='+', choices=list(nrp.builders), help='builders to run, all by default')
+    parser.add_argument('--formulations', nargs='+', choices=list(nrp.formulations), help='formulations to run, all by default')
+    parser.add_argument('--solvers', nargs='+', choices=list(nrp.solvers) + ['heuristic'], help='solvers to run, all and the heuristic by default')
+    parser.add_argument('--time-limit', type=float, default=60, help='solver time limit per run in seconds')
+    parser.add_argument('--day-salary', type=float, default=15)
+    parser.add_argument('--night-salary', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tasks', type=int, help='tasks per week, half the number of nurses by default')
+    parser.add_argument('--staffing', type=int, nargs=2, default=(1, 2), metavar=('MIN', 'MAX'), help='nurses per task')
+    parser.add_argument('--out', default='benchmarks', help='directory for the instances, the CSV and the plot')
+    args = parser.parse_args()
+
+    run_benchmark(
+        args.sizes, configurations(args.builders, args.formulations, args.solvers), args.day_salary, args.night_salary,
+        args.time_limit, args.seed, args.out, tasks=args.tasks, staffing=tuple(args.staffing)
+    )
@@ -0,0 +1,121 @@
+import time
+import itertools
+import numpy as np
+import gurobipy as gp
+import heuristic
+import NRP_OBP_D as nrp
+from solver_backends import solvers, relaxations
+
+def pattern_master(tasks_df, shift_df, day_salary, night_salary, time_limit, rate_table=None):
+    """Pulse model in which shift_scheduled is a mix of weekly patterns per nurse instead of the nurse rows F-I"""
+    model = nrp.build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', 'pulse', rate_table=rate_table)
+    model.update()
+
+    # A the weekly pattern columns replace the nurse_used rows and variables
+    nurse_rows = [
+        constraint for constraint in model.getConstrs()
+        if nrp._name_family(constraint.ConstrName) in ('nurse_used_lower', 'nurse_used_upper', 'min_shifts_week', 'max_shifts_week')
+    ]
+    model.remove(nurse_rows)
+    model.remove([var for var in model.getVars() if var.VarName.startswith('nurse_used_')])
+
+    # B every nurse works at most one pattern and shift_scheduled equals the patterns that contain it
+    nurses = shift_df['Nurse_ID'].unique()
+    model._convexity = {nurse: model.addLConstr(gp.LinExpr(), '<', 1, name=f"pattern_once_{nurse}") for nurse in nurses}
+    model._link = [
+        model.addLConstr(model.getVarByName(f"shift_scheduled[{shift}]"), '=', 0, name=f"pattern_link[{shift}]")
+        for shift in range(len(shift_df))
+    ]
+    model._patterns = []
+    model.update()
+    return model
+
+def add_pattern(model, nurse, shifts):
+    """Add the column of a weekly pattern, a set of shift rows of one nurse"""
+    column = gp.Column([1.0] + [-1.0] * len(shifts), [model._convexity[nurse]] + [model._link[shift] for shift in shifts])
+    model.addVar(lb=0, ub=1, vtype=gp.GRB.CONTINUOUS, name=f"pattern[{len(model._patterns)}]", column=column)
+    model._patterns.append((nurse, tuple(sorted(shifts))))
+
+def price_patterns(shift_df, link_duals, convexity_duals, per_nurse=None):
+    """Patterns with the lowest reduced cost per nurse, enumerated over all 4 and 5 shift subsets
+
+    A nurse with n available shifts has at most C(n, 4) + C(n, 5) patterns, 56 for one shift per day.
+    """
+    patterns = []
+    for nurse, shifts in shift_df.groupby('Nurse_ID', sort=False).groups.items():
+        shifts = np.asarray(shifts)
+        candidates = [
+            list(pattern)
+            for size in range(nrp.min_shift_per_week, nrp.max_shifts_per_week + 1)
+            for pattern in itertools.combinations(shifts, size)
+        ]
+        if not candidates:
+            continue
+        reduced_costs = np.array([link_duals[pattern].sum() for pattern in candidates]) - convexity_duals[nurse]
+        for best in np.argsort(reduced_costs, kind='stable')[:per_nurse]:
+            patterns.append((reduced_costs[best], nurse, candidates[best]))
+    return patterns
+
+def column_generation_solution(tasks_df, shift_df, day_salary, night_salary, solver='gurobi', time_limit=300, max_iterations=200, per_nurse=None, rate_table=None, threads=None):
+    """Solve the week by column generation over weekly nurse patterns and a restricted-master MIP
+
+    The master is the pulse model with the nurse rows F-I replaced by one column per weekly pattern
+    of 4 or 5 shifts. Pricing enumerates the patterns of every nurse and adds those with a negative
+    reduced cost under the duals of the shift_scheduled link rows. The heuristic schedule gives
+    the first columns so the restricted master MIP always has a feasible schedule. threads caps the
+    Gurobi threads of the LPs and the MIP.
+    """
+    solve_start = time.perf_counter()
+    if solver not in solvers:
+        raise ValueError(f"Unknown solver '{solver}', choose from {list(solvers)}")
+    model = pattern_master(tasks_df, shift_df, day_salary, night_salary, time_limit, rate_table)
+    if threads:
+        model.setParam('Threads', threads)
+    relax = relaxations[solver]
+
+    # C columns of the heuristic schedule
+    schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, rate_table=rate_table)
+    nurse_ids = shift_df['Nurse_ID'].to_numpy()
+    if schedule is not None:
+        for nurse in np.unique(nurse_ids[schedule['shift_scheduled']]):
+            add_pattern(model, nurse, np.flatnonzero(schedule['shift_scheduled'] & (nurse_ids == nurse)))
+    model.update()
+
+    link_rows = np.array([constraint.index for constraint in model._link])
+    convexity_rows = {nurse: constraint.index for nurse, constraint in model._convexity.items()}
+    report = {'iterations': 0, 'columns': len(model._patterns), 'lp_bound': None, 'converged': False}
+    for iteration in range(max_iterations):
+        if time.perf_counter() - solve_start > time_limit:
+            break
+        objective, _, duals = relax(model)
+        if objective is None:
+            break
+        report['iterations'] = iteration + 1
+        report['lp_bound'] = objective
+
+        # D add the patterns with a negative reduced cost
+        known = set(model._patterns)
+        added = 0
+        for reduced_cost, nurse, pattern in price_patterns(shift_df, duals[link_rows], {nurse: duals[row] for nurse, row in convexity_rows.items()}, per_nurse):
+            if reduced_cost < -1e-6 and (nurse, tuple(sorted(pattern))) not in known:
+                add_pattern(model, nurse, pattern)
+                added += 1
+        model.update()
+        if added == 0:
+            report['converged'] = True
+            break
+    report['columns'] = len(model._patterns)
+    report['lp_seconds'] = time.perf_counter() - solve_start
+
+    # E restricted master MIP over the generated patterns
+    patterns = [var for var in model.getVars() if var.VarName.startswith('pattern[')]
+    model.setAttr('VType', patterns, [gp.GRB.BINARY] * len(patterns))
+    model.setParam('TimeLimit', max(time_limit - (time.perf_counter() - solve_start), 1))
+    if schedule is not None and solver == 'gurobi':
+        heuristic.set_mip_start(model, schedule)
+    result = solvers[solver](model)
+    if result.SolCount > 0 and report['lp_bound'] is not None:
+        # the MIP is only proven optimal for the week when its value meets the bound of the full master LP
+        report['gap_to_lp_bound'] = (result.ObjVal - report['lp_bound']) / max(abs(result.ObjVal), 1e-10)
+    result._column_generation_report = report
+    return result
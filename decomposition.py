@@ -0,0 +1,222 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+import heuristic
+import NRP_OBP_D as nrp
+from solver_backends import solvers, ScheduleSolution, carry_input
+
+# share of the time limit for the day subproblems, the master step and the heuristic get the rest
+day_share = 0.8
+
+def interval_owners(shift_df):
+    """Day that is responsible for covering each interval, the day whose shifts cover it most often"""
+    n_times = len(nrp.time_range)
+    day_values = np.sort(shift_df['Day'].unique())
+    coverage = np.zeros((len(day_values), n_times))
+    for row, day in enumerate(day_values):
+        shifts = shift_df[shift_df['Day'] == day]
+        for start, end in zip(shifts['Start'].to_numpy(dtype=int), shifts['End'].to_numpy(dtype=int)):
+            coverage[row, start:end] += 1
+
+    # intervals no shift covers stay with their calendar day
+    owners = np.arange(n_times) // 96 + 1
+    covered = coverage.sum(axis=0) > 0
+    owners[covered] = day_values[np.argmax(coverage[:, covered], axis=0)]
+    return owners
+
+def restrict_day_model(model, owned):
+    """Drop the weekly shift limits and the coverage rows of intervals another day is responsible for"""
+    model.update()
+    constraints = model.getConstrs()
+    remove = []
+    for constraint, name in zip(constraints, model.getAttr('ConstrName', constraints)):
+        family = name.split('[')[0]
+        if family in ('min_shifts_week', 'max_shifts_week'):
+            remove.append(constraint)
+        elif family in ('nurse_demand', 'min_nurses') and not owned[int(name.split('[')[1].rstrip(']'))]:
+            remove.append(constraint)
+    model.remove(remove)
+
+    # A tasks stay inside the owned intervals where their window allows it
+    tasks_df = model._tasks_df
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    owned_sums = np.concatenate([[0], np.cumsum(owned)])
+    for task in range(len(tasks_df)):
+        starts = np.arange(max(int(tasks_df.loc[task, 'Start']), 0), min(int(tasks_df.loc[task, 'End']), len(owned) - duration[task]) + 1)
+        inside = starts[owned_sums[starts + duration[task]] - owned_sums[starts] == duration[task]]
+        if len(inside):
+            var = model.getVarByName(f"start_interval_day[{task}]")
+            var.LB = inside.min()
+            var.UB = inside.max()
+    model.update()
+
+def solve_day(tasks_df, shift_df, day_salary, night_salary, owned, solver, formulation, time_limit, threads, rate_table=None):
+    """Solve the subproblem of one day without the weekly shift limits
+
+    shift_df holds the shifts of the day and the shifts of other days that reach into the owned
+    intervals, those are needed for the handovers at the day boundary but are decided by their own day.
+    """
+    shift_rows = shift_df.index.to_numpy()
+    task_rows = tasks_df.index.to_numpy()
+    shift_df = shift_df.reset_index(drop=True)
+    tasks_df = tasks_df.reset_index(drop=True)
+
+    solve_start = time.perf_counter()
+    model = nrp.build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', formulation, rate_table=rate_table)
+    model.setParam('OutputFlag', 0)
+    if threads:
+        model.setParam('Threads', threads)
+    restrict_day_model(model, owned)
+    result = solvers[solver](model)
+
+    day = {'status': result.Status, 'runtime': time.perf_counter() - solve_start, 'shift_rows': shift_rows[:0], 'break_start': [], 'task_rows': task_rows, 'task_start': np.full(len(task_rows), -1)}
+    if result.SolCount == 0:
+        return day
+
+    values = {var.varName: var.x for var in result.getVars()}
+    scheduled = np.array([values[f"shift_scheduled[{shift}]"] > 0.5 for shift in range(len(shift_df))], dtype=bool)
+    break_start = np.full(len(shift_df), -1)
+    for name, value in values.items():
+        if name.startswith('break_start[') and value > 0.5:
+            shift, t = name.split('[')[1].rstrip(']').split(',')
+            break_start[int(shift)] = int(t)
+        elif name.startswith('break_start_time['):
+            break_start[int(name.split('[')[1].rstrip(']'))] = int(round(value))
+    day['shift_rows'] = shift_rows[scheduled]
+    day['break_start'] = break_start[scheduled]
+    day['task_start'] = np.array([int(round(values[f"start_interval_day[{task}]"])) for task in range(len(tasks_df))])
+    return day
+
+def assign_nurses(shift_df, scheduled, break_start, shift_cost, solver, time_limit, threads=None):
+    """Master step: give the shift times the days chose to nurses so every used nurse works 4-5 shifts
+
+    Coverage only depends on which shift times are worked, so any row with the same Day, Start
+    and End can take a chosen shift. Extra rows may be added at their salary (shift_cost, at the
+    real rates) when the weekly limits can not be met with the chosen shifts alone.
+    """
+    nurses, shift_nurse = np.unique(shift_df['Nurse_ID'].to_numpy(), return_inverse=True)
+    _, shift_key = np.unique(shift_df[['Day', 'Start', 'End']].to_numpy(dtype=int), axis=0, return_inverse=True)
+    shift_key = shift_key.ravel()
+    keys, chosen = np.unique(shift_key[scheduled], return_counts=True)
+    rows = np.flatnonzero(np.isin(shift_key, keys))
+
+    master = gp.Model("NurseAssignment")
+    master.setParam('OutputFlag', 0)
+    master.setParam('TimeLimit', time_limit)
+    if threads:
+        master.setParam('Threads', threads)
+    assigned = master.addMVar(len(rows), vtype=gp.GRB.BINARY, name="assigned")
+    nurse_used = master.addMVar(len(nurses), vtype=gp.GRB.BINARY, name="nurse_used")
+    key_rows = sp.csr_matrix((np.ones(len(rows)), (np.searchsorted(keys, shift_key[rows]), np.arange(len(rows)))), shape=(len(keys), len(rows)))
+    nurse_rows = sp.csr_matrix((np.ones(len(rows)), (shift_nurse[rows], np.arange(len(rows)))), shape=(len(nurses), len(rows)))
+    eye_n = sp.identity(len(nurses), format='csr')
+
+    # A every chosen shift time is worked at least as often as the days asked for
+    master.addMConstr(key_rows, assigned, '>', chosen.astype(float), name="shift_times")
+
+    # B used nurses work between 4 and 5 shifts
+    master.addMConstr(sp.hstack([nurse_rows, -nrp.min_shift_per_week * eye_n], format='csr'), gp.hstack([assigned, nurse_used]), '>', np.zeros(len(nurses)), name="min_shifts_week")
+    master.addMConstr(sp.hstack([nurse_rows, -nrp.max_shifts_per_week * eye_n], format='csr'), gp.hstack([assigned, nurse_used]), '<', np.zeros(len(nurses)), name="max_shifts_week")
+    master.setObjective(gp.quicksum(shift_cost[row] * assigned[i] for i, row in enumerate(rows)), gp.GRB.MINIMIZE)
+
+    result = solvers[solver](master)
+    if result.SolCount == 0:
+        return None, None
+    picked = rows[[result.getVarByName(f"assigned[{i}]").x > 0.5 for i in range(len(rows))]]
+
+    # C the chosen breaks follow their shift time, extra shifts get theirs from the heuristic
+    new_scheduled = np.zeros(len(shift_df), dtype=bool)
+    new_scheduled[picked] = True
+    new_break_start = np.full(len(shift_df), -1)
+    for key in keys:
+        breaks = break_start[scheduled & (shift_key == key)]
+        targets = picked[shift_key[picked] == key]
+        new_break_start[targets[:len(breaks)]] = breaks[:len(targets)]
+    return new_scheduled, new_break_start
+
+def decomposition_solution(tasks_df, shift_df, day_salary, night_salary, solver='gurobi', formulation='pulse', time_limit=300, workers=None, rate_table=None, threads=None):
+    """Solve the week as one subproblem per day in a process pool and repair the weekly shift limits
+
+    The days only interact through the 4-5 shifts per nurse and the shifts that cross midnight.
+    Every interval is covered by the day whose shifts cover it most and each day also sees the
+    shifts of its neighbours that reach into its intervals. A master MIP then hands the chosen shift
+    times to nurses within the weekly limits and the constructive heuristic completes and checks
+    the combined schedule. time_limit is the budget of the whole run: the days that run one after
+    another in the pool share day_share of it and the master gets what is left. threads is the core
+    budget of the run, all cores by default, split over the workers of the pool.
+    """
+    solve_start = time.perf_counter()
+    if solver not in solvers:
+        raise ValueError(f"Unknown solver '{solver}', choose from {list(solvers)}")
+    day_values = np.sort(shift_df['Day'].unique())
+    owners = interval_owners(shift_df)
+    cores = threads or os.cpu_count() or 1
+    workers = workers or min(len(day_values), cores)
+    day_threads = max(1, cores // workers)
+    day_limit = max(day_share * time_limit / np.ceil(len(day_values) / workers), 1)
+
+    # every day sees its own shifts and the shifts of neighbouring days that overlap its intervals
+    shift_start = shift_df['Start'].to_numpy(dtype=int)
+    shift_end = shift_df['End'].to_numpy(dtype=int)
+    owner_sums = {day: np.concatenate([[0], np.cumsum(owners == day)]) for day in day_values}
+    day_shifts = {day: (shift_df['Day'].to_numpy() == day) | (owner_sums[day][shift_end] > owner_sums[day][shift_start]) for day in day_values}
+
+    # A Gurobi environments must not be shared with forked children, so the pool spawns fresh processes
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [
+            pool.submit(
+                solve_day, tasks_df[tasks_df['Day'] == day], shift_df[day_shifts[day]],
+                day_salary, night_salary, owners == day, solver, formulation, day_limit, day_threads, rate_table
+            )
+            for day in day_values
+        ]
+        days = [future.result() for future in futures]
+    days_seconds = time.perf_counter() - solve_start
+
+    # B a shift is decided by the subproblem of its own day
+    initial = {
+        'shift_scheduled': np.zeros(len(shift_df), dtype=bool),
+        'break_start': np.full(len(shift_df), -1),
+        'task_start': np.full(len(tasks_df), -1),
+    }
+    for value, day in zip(day_values, days):
+        own = shift_df.loc[day['shift_rows'], 'Day'].to_numpy() == value
+        initial['shift_scheduled'][day['shift_rows'][own]] = True
+        initial['break_start'][day['shift_rows'][own]] = day['break_start'][own]
+        initial['task_start'][day['task_rows']] = day['task_start']
+    interval_rate, shift_cost = heuristic.shift_costs_at_rates(shift_df, day_salary, night_salary, rate_table)
+    nurse_ids = shift_df['Nurse_ID'].to_numpy()
+    report = {
+        'days': len(day_values),
+        'workers': workers,
+        'day_threads': day_threads,
+        'day_time_limit': day_limit,
+        'day_status': [day['status'] for day in days],
+        'day_seconds': [round(day['runtime'], 3) for day in days],
+        'days_wall_seconds': days_seconds,
+        'day_salary': shift_cost[initial['shift_scheduled']].sum(),
+        'nurses_outside_limits': int(sum(not nrp.min_shift_per_week <= count <= nrp.max_shifts_per_week for count in np.unique(nurse_ids[initial['shift_scheduled']], return_counts=True)[1])),
+    }
+
+    # C master step on the weekly limits, then complete whatever the combined days still miss
+    master_limit = max(time_limit - (time.perf_counter() - solve_start), 1)
+    scheduled, break_start = assign_nurses(shift_df, initial['shift_scheduled'], initial['break_start'], shift_cost, solver, master_limit, cores)
+    report['master_feasible'] = scheduled is not None
+    if scheduled is not None:
+        initial['shift_scheduled'], initial['break_start'] = scheduled, break_start
+    schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+    runtime = time.perf_counter() - solve_start
+    if schedule is None:
+        solution = ScheduleSolution([], [], gp.GRB.INTERRUPTED, runtime=runtime)
+    else:
+        report['shifts_added'] = int((schedule['shift_scheduled'] & ~initial['shift_scheduled']).sum())
+        solution = ScheduleSolution(*heuristic.schedule_variables(tasks_df, schedule), gp.GRB.SUBOPTIMAL, schedule['cost'], runtime=runtime)
+
+    # the combined schedule is stored with shift_scheduled and break_start like the pulse formulation
+    carry_input(solution, 'pulse', shift_df, tasks_df, interval_rate)
+    solution._decomposition_report = report
+    return solution
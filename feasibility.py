@@ -0,0 +1,151 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import milp, LinearConstraint, Bounds
+import heuristic
+import NRP_OBP_D as nrp
+
+def interval_label(t):
+    """Day and clock time of a week interval, e.g. ('Tuesday', '07:15')"""
+    minutes = (t % 96) * 15
+    return nrp.weekdays[t // 96], f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def feasibility_check(tasks_df, shift_df):
+    """Necessary conditions for a feasible week, checked per interval and per task without building the model
+
+    Only counts what every feasible schedule needs, so a week that fails is certainly infeasible:
+    - a nurse with fewer than 4 shifts that can be scheduled can never be used;
+    - at least 2 nurses must be able to be on shift in every interval;
+    - the nurses that can be on shift and are not handing over must cover the task demand
+      that is fixed by the task windows alone, a nurse handing over only covers its own handover;
+    - every task needs a start inside its window where enough of those nurses are available.
+    """
+    check_start = time.perf_counter()
+    n_times = len(nrp.time_range)
+    times = np.arange(n_times)
+
+    # A shifts that can be scheduled, only nurses with at least 4 of them can work at all
+    handover1, handover2, allowed = heuristic.handover_windows(shift_df)
+    nurse_ids = shift_df['Nurse_ID'].to_numpy()
+    usable_per_nurse = pd.Series(allowed).groupby(nurse_ids).sum()
+    unusable_nurses = usable_per_nurse.index[usable_per_nurse < nrp.min_shift_per_week].tolist()
+    usable = allowed & ~np.isin(nurse_ids, unusable_nurses)
+
+    # B most nurses on shift and most nurses free for tasks per interval
+    shift_window = (times[None, :] >= shift_df['Start'].to_numpy(dtype=int)[:, None]) & (times[None, :] < shift_df['End'].to_numpy(dtype=int)[:, None])
+    available = shift_window[usable].sum(axis=0)
+    free = (shift_window & ~(handover1 | handover2))[usable].sum(axis=0)
+
+    # C demand every placement of the tasks has, the part of a task that overlaps all of its possible starts
+    earliest = tasks_df['Start'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    latest = np.minimum(tasks_df['End'].to_numpy(dtype=int), n_times - duration)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    fixed_part = (times[None, :] >= latest[:, None]) & (times[None, :] < (earliest + duration)[:, None])
+    fixed_demand = fixed_part.T @ task_nurses
+
+    short = (available < 2) | (free < fixed_demand)
+    intervals = pd.DataFrame({
+        'interval': times[short],
+        'day': [interval_label(t)[0] for t in times[short]],
+        'time': [interval_label(t)[1] for t in times[short]],
+        'nurses_available': available[short],
+        'nurses_free_for_tasks': free[short],
+        'fixed_task_demand': fixed_demand[short],
+        'reason': np.where(available[short] < 2, 'fewer than 2 nurses can be on shift', 'fixed task demand exceeds the nurses free for tasks'),
+    })
+
+    # D every task needs a start where the free nurses cover it for its whole duration
+    problems = []
+    for task in range(len(tasks_df)):
+        starts = np.arange(max(earliest[task], 0), latest[task] + 1)
+        if len(starts) == 0:
+            problems.append('the window ends before the task fits in the week')
+            continue
+        fewest_free = np.lib.stride_tricks.sliding_window_view(free, duration[task])[starts].min(axis=1)
+        problems.append(None if (fewest_free >= task_nurses[task]).any() else f"no start in the window has {task_nurses[task]:g} nurses free for its whole duration")
+    problems = np.array(problems, dtype=object)
+    failing = np.flatnonzero(problems != None)
+    tasks = pd.DataFrame({
+        'task': tasks_df['Task'].to_numpy()[failing] if 'Task' in tasks_df else failing,
+        'day': [nrp.weekdays[int(day) - 1] for day in tasks_df['Day'].to_numpy()[failing]],
+        'window': [f"{interval_label(earliest[task])[1]}-{interval_label(max(latest[task], earliest[task]))[1]}" for task in failing],
+        'nurses': task_nurses[failing],
+        'reason': problems[failing],
+    })
+
+    return {
+        'feasible': intervals.empty and tasks.empty,
+        'intervals': intervals,
+        'tasks': tasks,
+        'unusable_nurses': unusable_nurses,
+        'seconds': time.perf_counter() - check_start,
+    }
+
+def salary_lower_bound(tasks_df, shift_df, interval_rate, time_limit=10):
+    """Lower bound on the weekly salary from the cheapest shifts that cover a relaxed staffing profile
+
+    The covering problem keeps the shifts and their costs but drops the tasks' start times, the
+    handover counts and the weekly limits per nurse. Besides the floor of 2 and the fixed task demand
+    per interval, it asks every block of intervals (each day, the week, each task day and each break
+    window) to hold the staffing and task work of the block net of the breaks that must fall inside it.
+    Returns None when the relaxation has no solution.
+    """
+    n_times = len(nrp.time_range)
+    times = np.arange(n_times)
+
+    # A the shifts that can be scheduled with their windows, handover-free parts and break windows
+    handover1, handover2, allowed = heuristic.handover_windows(shift_df)
+    start = shift_df['Start'].to_numpy(dtype=int)[allowed]
+    end = shift_df['End'].to_numpy(dtype=int)[allowed]
+    shift_window = (times[None, :] >= start[:, None]) & (times[None, :] < end[:, None])
+    free_window = shift_window & ~(handover1 | handover2)[allowed]
+    cost = nrp.shift_costs(shift_df, interval_rate)[allowed]
+
+    # B per interval at least 2 nurses on shift and the fixed task demand covered by nurses not handing over
+    earliest = tasks_df['Start'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    latest = np.minimum(tasks_df['End'].to_numpy(dtype=int), n_times - duration)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    fixed_demand = ((times[None, :] >= latest[:, None]) & (times[None, :] < (earliest + duration)[:, None])).T @ task_nurses
+    rows = [shift_window.T.astype(float), free_window.T.astype(float)]
+    lower = [np.full(n_times, 2.0), fixed_demand]
+
+    # C per block the intervals on shift minus the 2 break intervals of shifts whose break window lies inside
+    blocks = {(day * 96, (day + 1) * 96) for day in range(len(nrp.weekdays))} | {(0, n_times)}
+    blocks |= set(zip((start + 14).tolist(), (start + 22).tolist()))
+    for day in np.unique(tasks_df['Day']):
+        on_day = tasks_df['Day'].to_numpy() == day
+        blocks.add((earliest[on_day].min(), (latest[on_day] + duration[on_day]).max()))
+    for block_start, block_end in sorted(blocks):
+        inside = (times >= block_start) & (times < block_end)
+        break_inside = 2 * ((start + 14 >= block_start) & (start + 22 <= block_end))
+        within = (earliest >= block_start) & (latest + duration <= block_end)
+        rows += [(shift_window[:, inside].sum(axis=1) - break_inside)[None, :], (free_window[:, inside].sum(axis=1) - break_inside)[None, :]]
+        lower += [[2.0 * inside.sum()], [(task_nurses * duration)[within].sum()]]
+
+    # D HiGHS solves the covering problem, its dual bound stays valid when the time limit stops it
+    result = milp(
+        cost,
+        constraints=LinearConstraint(sp.csr_matrix(np.vstack(rows)), np.concatenate(lower), np.inf),
+        integrality=np.ones(len(cost)),
+        bounds=Bounds(0, 1),
+        options={'time_limit': time_limit},
+    )
+    if result.status not in (0, 1):
+        return None
+    bound = getattr(result, 'mip_dual_bound', None)
+    return bound if bound is not None else result.fun
+
+def describe(report):
+    """One line summary of a failed check with the days, intervals and tasks that can not be covered"""
+    parts = []
+    intervals = report['intervals']
+    if not intervals.empty:
+        for day, rows in intervals.groupby('day', sort=False):
+            parts.append(f"{day} {rows['time'].iloc[0]}-{rows['time'].iloc[-1]} ({len(rows)} intervals)")
+    tasks = report['tasks']
+    if not tasks.empty:
+        parts.append("tasks " + ", ".join(f"{task} ({day})" for task, day in zip(tasks['task'], tasks['day'])))
+    return "Can not be covered: " + "; ".join(parts)
@@ -1,9 +1,10 @@
 import streamlit as st
 import streamlit_calendar as sc
-from NRP_OBP_D import main
+from NRP_OBP_D import main, break_duration
 from datetime import datetime, timedelta
 import xlsxwriter
 from io import BytesIO
+import profiling
 
 def handle_view_change(calendar_data):
     """Handle calendar view changes"""
@@ -101,6 +102,7 @@ def get_base_calendar_options(calendar_type):
         "height": "auto"
     }
 
+@profiling.profile('calendar_creator')
 def calendar_creator(model, calendar_type, task_sheet_df):
     # Initialize data structures
     nurse_shifts = {}
@@ -144,21 +146,33 @@ def calendar_creator(model, calendar_type, task_sheet_df):
             "resourceGroupField": "nurse_id"
         })
 
+    # Reduced formulations have no nurse_active variables, shifts are rebuilt from shift_scheduled
+    reduced = getattr(model, '_formulation', 'full') != 'full'
+
     # Process model variables
     for var in model.getVars():
         if var.x == 1:
-            if "nurse_active" in var.varName:
-                nurse_id, interval = process_interval_var(var.varName)
+            if reduced and "shift_scheduled" in var.varName:
+                shift_id = int(var.varName.split("[")[1].split("]")[0])
+                for nurse_id, interval in process_shift_var(model._shift_df, shift_id):
+                    add_to_dict(nurse_shifts, nurse_id, interval)
+            elif "nurse_active" in var.varName:
+                nurse_id, interval = process_interval_var(model._shift_df, var.varName)
                 add_to_dict(nurse_shifts, nurse_id, interval)
             elif "handover1_active" in var.varName:
-                nurse_id, interval = process_interval_var(var.varName)
+                nurse_id, interval = process_interval_var(model._shift_df, var.varName)
                 add_to_dict(handover1, nurse_id, interval)
             elif "handover2_active" in var.varName:
-                nurse_id, interval = process_interval_var(var.varName)
+                nurse_id, interval = process_interval_var(model._shift_df, var.varName)
                 add_to_dict(handover2, nurse_id, interval)
             elif "break_active" in var.varName:
-                nurse_id, interval = process_interval_var(var.varName)
+                nurse_id, interval = process_interval_var(model._shift_df, var.varName)
                 add_to_dict(break_shifts, nurse_id, interval)
+            elif var.varName.startswith("break_start["):
+                # Pulse formulation stores only the break start, the break covers break_duration intervals
+                shift_id, start = map(int, var.varName.split("[")[1].split("]")[0].split(","))
+                for interval in range(start, start + break_duration):
+                    add_to_dict(break_shifts, *map_interval(model._shift_df, shift_id, interval))
         elif "start_interval" in var.varName:
             task_id = int(var.varName.split("[")[1].split("]")[0])
             add_task_interval(task_intervals, task_id, var.x, "start")
@@ -228,19 +242,28 @@ def calendar_creator(model, calendar_type, task_sheet_df):
 
     return calendar, nurse_shifts, break_shifts, handover1, handover2
 
-def process_interval_var(var_name):
+def process_interval_var(shift_df, var_name):
     """Extract nurse_id and interval from variable name correctly mapping to personnel_df"""
     parts = var_name.split("[")[1].split("]")[0].split(",")
-    original_id = int(parts[0])  # Original nurse ID from model
+    shift_id = int(parts[0])  # Shift row in the model
     interval = int(parts[1])
-    
+
+    return map_interval(shift_df, shift_id, interval)
+
+def process_shift_var(shift_df, shift_id):
+    """Expand a scheduled shift into the mapped nurse_id and interval data of its [Start, End) window"""
+    start = shift_df.loc[shift_id, 'Start']
+    end = min(shift_df.loc[shift_id, 'End'], 672)
+    return [map_interval(shift_df, shift_id, interval) for interval in range(start, end)]
+
+def map_interval(shift_df, shift_id, interval):
+    """Map a shift id and week interval to the nurse_id and (day, day interval)"""
     # Calculate which day of week (0-6) this interval belongs to
     day = interval // 96  # Integer division to get day number
     day_interval = interval % 96  # Remainder gives interval within day
     
-    # Map the nurse ID based on personnel_df length and day
-    total_nurses = st.session_state.personnel_df_final.shape[0]  # Get total number of nurses
-    actual_nurse = ((original_id - 1) % total_nurses) + 1  # Map to actual nurse ID
+    # Shift rows are filtered before the model is built, so the nurse comes from the shift row itself
+    actual_nurse = int(shift_df.loc[shift_id, 'Nurse_ID'])
     
     # Return mapped nurse ID and interval data
     return actual_nurse, (day + 1, day_interval)
@@ -273,8 +296,9 @@ def add_to_dict(target_dict, nurse_id, interval_data):
 
 def add_task_interval(task_intervals, task_id, interval_value, bound_type):
     """Add task interval data"""
-    day = (int(interval_value) // 96) + 1
-    day_interval = int(interval_value) % 96
+    interval_value = int(round(interval_value))
+    day = (interval_value // 96) + 1
+    day_interval = interval_value % 96
     
     if day not in task_intervals:
         task_intervals[day] = {}
@@ -0,0 +1,275 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+import NRP_OBP_D as nrp
+from solver_backends import ScheduleSolution, carry_input
+
+def place_tasks(tasks_df, n_times, fixed_start=None, blocked=None):
+    """Place every task at the start that keeps the per-interval demand profile flattest
+
+    Starts that make a task overlap a blocked interval are skipped when the window has other starts.
+    """
+    demand = np.zeros(n_times)
+    task_start = np.full(len(tasks_df), -1)
+    earliest = tasks_df['Start'].to_numpy(dtype=int)
+    latest = tasks_df['End'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+
+    # tasks with a known start keep it
+    if fixed_start is not None:
+        for task in np.flatnonzero(fixed_start >= 0):
+            task_start[task] = fixed_start[task]
+            demand[task_start[task]:task_start[task] + duration[task]] += nurses[task]
+
+    # largest tasks first, they have the least room to move around
+    for task in np.argsort(-nurses * duration, kind='stable'):
+        if task_start[task] >= 0:
+            continue
+        starts = np.arange(max(earliest[task], 0), min(latest[task], n_times - duration[task]) + 1)
+        if len(starts) == 0:
+            return None, None
+        if blocked is not None:
+            blocked_sums = np.concatenate([[0], np.cumsum(blocked)])
+            free = blocked_sums[starts + duration[task]] == blocked_sums[starts]
+            starts = starts[free] if free.any() else starts
+
+        # sum of squared demand over the task window after placing it at each start
+        sums = np.concatenate([[0.0], np.cumsum(demand)])
+        squares = np.concatenate([[0.0], np.cumsum(demand ** 2)])
+        window_sum = sums[starts + duration[task]] - sums[starts]
+        window_squares = squares[starts + duration[task]] - squares[starts]
+        spread = window_squares + 2 * nurses[task] * window_sum + duration[task] * nurses[task] ** 2
+
+        task_start[task] = starts[np.argmin(spread)]
+        demand[task_start[task]:task_start[task] + duration[task]] += nurses[task]
+    return task_start, demand
+
+def staffing_shortage(schedule, demand):
+    """Per interval shortage of active nurses against demand, handovers and the minimum of 2"""
+    present = schedule['shift_window'].T @ schedule['y'].astype(float)
+    on_break = np.zeros(len(demand))
+    np.add.at(on_break, schedule['break_start'][schedule['y']], 1)
+    np.add.at(on_break, schedule['break_start'][schedule['y']] + 1, 1)
+    all1 = schedule['handover1_window'].T @ schedule['y'].astype(float)
+    all2 = schedule['handover2_window'].T @ schedule['y'].astype(float)
+    handover_needed = np.where(all2 == 0, all1, 0) + np.where(all1 == 0, all2, 0)
+
+    required = np.maximum(demand + all1 + all2 + handover_needed / 3, 2)
+    return required - (present - on_break)
+
+def place_break(schedule, shift, shortage):
+    """Put the break of a shift where the two break intervals have the least shortage"""
+    starts = np.arange(schedule['break_earliest'][shift], schedule['break_latest'][shift] + 1)
+    schedule['break_start'][shift] = starts[np.argmin(np.maximum(shortage[starts], shortage[starts + 1]))]
+
+def shift_costs_at_rates(shift_df, day_salary, night_salary, rate_table=None):
+    """Salary rate per interval and salary cost of every shift at the day/night rates or rate_table, see NRP_OBP_D.shift_costs"""
+    interval_rate = nrp.interval_rates(day_salary, night_salary, rate_table)
+    return interval_rate, nrp.shift_costs(shift_df, interval_rate)
+
+def handover_windows(shift_df):
+    """Handover 1 and 2 intervals of every shift inside the handover range and which shifts can be scheduled
+
+    Shifts whose handover must happen outside the handover range can never be scheduled.
+    """
+    n_times = len(nrp.time_range)
+    times = np.arange(n_times)
+    shift_start = shift_df['Start'].to_numpy(dtype=int)
+    shift_end = shift_df['End'].to_numpy(dtype=int)
+    in_range = (times >= nrp.handover_start) & (times < nrp.handover_end)
+    handover1_happening = shift_start + 1 > nrp.handover_start
+    handover2_happening = shift_end - 1 < nrp.handover_end
+    handover1 = (times[None, :] >= shift_start[:, None]) & (times[None, :] <= shift_start[:, None] + 1) & handover1_happening[:, None]
+    handover2 = (times[None, :] >= shift_end[:, None] - 2) & (times[None, :] <= shift_end[:, None] - 1) & handover2_happening[:, None]
+    allowed = ((handover1 & in_range).sum(axis=1) == handover1.sum(axis=1)) & ((handover2 & in_range).sum(axis=1) == handover2.sum(axis=1))
+    allowed &= shift_start + 14 <= n_times - nrp.break_duration
+    return handover1 & in_range, handover2 & in_range, allowed
+
+def handover_only_intervals(shift_df):
+    """Intervals where every shift that can be there is in its handover, a task there can never be staffed"""
+    times = np.arange(len(nrp.time_range))
+    handover1, handover2, allowed = handover_windows(shift_df)
+    shift_window = (times[None, :] >= shift_df['Start'].to_numpy(dtype=int)[:, None]) & (times[None, :] < shift_df['End'].to_numpy(dtype=int)[:, None])
+    free = shift_window & ~(handover1 | handover2) & allowed[:, None]
+    return free.sum(axis=0) == 0
+
+def construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial=None, rate_table=None):
+    """Greedy schedule: flatten task demand, then add the cheapest shifts per covered shortage
+
+    An initial schedule (shift_scheduled, break_start and task_start, -1 where unknown) is kept
+    where it is still allowed and completed into a feasible schedule.
+    """
+    n_times = len(nrp.time_range)
+    n_shifts = len(shift_df)
+    times = np.arange(n_times)
+    shift_start = shift_df['Start'].to_numpy(dtype=int)
+    shift_end = shift_df['End'].to_numpy(dtype=int)
+    nurse_ids = shift_df['Nurse_ID'].to_numpy()
+    nurses, shift_nurse = np.unique(nurse_ids, return_inverse=True)
+
+    task_start, demand = place_tasks(tasks_df, n_times, None if initial is None else initial['task_start'], handover_only_intervals(shift_df))
+    if task_start is None:
+        return None
+
+    # A salary cost of every shift
+    interval_rate, shift_cost = shift_costs_at_rates(shift_df, day_salary, night_salary, rate_table)
+
+    # B handover windows and the shifts that can be scheduled
+    handover1, handover2, allowed = handover_windows(shift_df)
+
+    shift_window = (times[None, :] >= shift_start[:, None]) & (times[None, :] < shift_end[:, None])
+    schedule = {
+        'y': np.zeros(n_shifts, dtype=bool),
+        'break_start': np.zeros(n_shifts, dtype=int),
+        'break_earliest': shift_start + 14,
+        'break_latest': np.minimum(shift_start + 21 - (nrp.break_duration - 1), n_times - nrp.break_duration),
+        'shift_window': sp.csr_matrix(shift_window, dtype=float),
+        'handover1_window': sp.csr_matrix(handover1, dtype=float),
+        'handover2_window': sp.csr_matrix(handover2, dtype=float),
+    }
+    excluded = np.zeros(len(nurses), dtype=bool)
+
+    if initial is not None:
+        schedule['y'] = initial['shift_scheduled'] & allowed
+        known_break = (initial['break_start'] >= schedule['break_earliest']) & (initial['break_start'] <= schedule['break_latest'])
+        schedule['break_start'] = np.where(known_break, initial['break_start'], schedule['break_earliest'])
+        shortage = staffing_shortage(schedule, demand)
+        for shift in np.flatnonzero(schedule['y'] & ~known_break):
+            place_break(schedule, shift, shortage)
+
+    while True:
+        # C add the shift that covers most short intervals per euro until nothing is short
+        for _ in range(n_shifts + 1):
+            shortage = staffing_shortage(schedule, demand)
+            if (shortage <= 1e-9).all():
+                break
+            shifts_worked = np.bincount(shift_nurse[schedule['y']], minlength=len(nurses))
+            candidates = allowed & ~schedule['y'] & ~excluded[shift_nurse] & (shifts_worked[shift_nurse] < nrp.max_shifts_per_week)
+            covered = schedule['shift_window'] @ (shortage > 1e-9).astype(float)
+            covered[~candidates] = 0
+            if covered.max() <= 0:
+                return None
+            shift = np.argmax(covered / np.maximum(shift_cost, 1e-9))
+            schedule['y'][shift] = True
+            place_break(schedule, shift, shortage)
+        else:
+            return None
+
+        # D nurses that are used must work at least 4 shifts, top them up or stop using them
+        shifts_worked = np.bincount(shift_nurse[schedule['y']], minlength=len(nurses))
+        short_nurses = np.flatnonzero((shifts_worked > 0) & (shifts_worked < nrp.min_shift_per_week))
+        if len(short_nurses) == 0:
+            break
+        for nurse in short_nurses:
+            spare = np.flatnonzero((shift_nurse == nurse) & allowed & ~schedule['y'])
+            missing = nrp.min_shift_per_week - shifts_worked[nurse]
+            if len(spare) < missing:
+                excluded[nurse] = True
+                schedule['y'][shift_nurse == nurse] = False
+                continue
+            for shift in spare[np.argsort(shift_cost[spare], kind='stable')][:missing]:
+                schedule['y'][shift] = True
+                place_break(schedule, shift, staffing_shortage(schedule, demand))
+
+    # E move every break to the quietest moment now that all shifts are known
+    for shift in np.flatnonzero(schedule['y']):
+        schedule['y'][shift] = False
+        shortage = staffing_shortage(schedule, demand)
+        schedule['y'][shift] = True
+        place_break(schedule, shift, shortage)
+    if (staffing_shortage(schedule, demand) > 1e-9).any():
+        return None
+
+    return {
+        'shift_scheduled': schedule['y'],
+        'break_start': np.where(schedule['y'], schedule['break_start'], -1),
+        'task_start': task_start,
+        'nurses_needed': demand,
+        'handover1': handover1 & schedule['y'][:, None],
+        'handover2': handover2 & schedule['y'][:, None],
+        'shift_window': shift_window,
+        'interval_rate': interval_rate,
+        'nurse_used': np.isin(nurses, nurse_ids[schedule['y']]),
+        'nurses': nurses,
+        'cost': shift_cost[schedule['y']].sum(),
+    }
+
+def set_mip_start(model, schedule):
+    """Pass the heuristic schedule to Gurobi as MIP start through the Start attributes"""
+    model.update()
+    variables = model.getVars()
+    index = {name: i for i, name in enumerate(model.getAttr('VarName', variables))}
+    start = np.full(len(variables), gp.GRB.UNDEFINED)
+
+    # binaries that describe where shifts, breaks, handovers and tasks are active default to off
+    families = ('shift_scheduled', 'nurse_active', 'break_active', 'break_start[', 'handover1_active', 'handover2_active', 'active_tasks', 'task_start', 'nurse_used')
+    for name, i in index.items():
+        if name.startswith(families):
+            start[i] = 0
+
+    def put(name, value):
+        if name in index:
+            start[index[name]] = value
+
+    duration = model._tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    for task, task_start in enumerate(schedule['task_start']):
+        put(f"start_interval_day[{task}]", task_start)
+        put(f"end_interval_day[{task}]", task_start + duration[task] - 1)
+        put(f"task_start[{task},{task_start}]", 1)
+        for t in range(task_start, task_start + duration[task]):
+            put(f"active_tasks[{task},{t}]", 1)
+
+    for shift in np.flatnonzero(schedule['shift_scheduled']):
+        break_start = schedule['break_start'][shift]
+        put(f"shift_scheduled[{shift}]", 1)
+        put(f"break_start_time[{shift}]", break_start)
+        put(f"break_end_time[{shift}]", break_start + nrp.break_duration - 1)
+        put(f"break_start[{shift},{break_start}]", 1)
+        for t in range(break_start, break_start + nrp.break_duration):
+            put(f"break_active[{shift},{t}]", 1)
+        for t in np.flatnonzero(schedule['shift_window'][shift]):
+            put(f"nurse_active[{shift},{t}]", 1)
+        for t in np.flatnonzero(schedule['handover1'][shift]):
+            put(f"handover1_active[{shift},{t}]", 1)
+        for t in np.flatnonzero(schedule['handover2'][shift]):
+            put(f"handover2_active[{shift},{t}]", 1)
+
+    for nurse, used in zip(schedule['nurses'], schedule['nurse_used']):
+        put(f"nurse_used_{nurse}", int(used))
+
+    model.setAttr('Start', variables, start.tolist())
+
+def heuristic_solution(tasks_df, shift_df, day_salary, night_salary, initial=None, rate_table=None):
+    """Run the constructive heuristic and return it in the solution structure of the output pages"""
+    solve_start = time.perf_counter()
+    schedule = construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+    runtime = time.perf_counter() - solve_start
+    if schedule is None:
+        solution = ScheduleSolution([], [], gp.GRB.INTERRUPTED, runtime=runtime)
+    else:
+        solution = ScheduleSolution(*schedule_variables(tasks_df, schedule), gp.GRB.SUBOPTIMAL, schedule['cost'], runtime=runtime)
+
+    # the heuristic solution is stored with shift_scheduled and break_start like the pulse formulation
+    return carry_input(solution, 'pulse', shift_df, tasks_df, nrp.interval_rates(day_salary, night_salary, rate_table))
+
+def schedule_variables(tasks_df, schedule):
+    """Names and values of the pulse formulation variables that describe a heuristic schedule"""
+    names, values = [], []
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    y = schedule['shift_scheduled']
+
+    names += [f"shift_scheduled[{shift}]" for shift in range(len(y))]
+    values += y.astype(float).tolist()
+    for shift in np.flatnonzero(y):
+        names.append(f"break_start[{shift},{schedule['break_start'][shift]}]")
+        values.append(1.0)
+        for family in ('handover1', 'handover2'):
+            for t in np.flatnonzero(schedule[family][shift]):
+                names.append(f"{family}_active[{shift},{t}]")
+                values.append(1.0)
+    for task, task_start in enumerate(schedule['task_start']):
+        names += [f"start_interval_day[{task}]", f"end_interval_day[{task}]"]
+        values += [float(task_start), float(task_start + duration[task] - 1)]
+    return names, values
@@ -0,0 +1,83 @@
+from datetime import time
+import numpy as np
+import pandas as pd
+import NRP_OBP_D as nrp
+
+# weekly availability per preset as (start, end) per day, 00:00-00:00 is a day off
+presets = {
+    'day': [(time(7, 0), time(15, 30))] * 7,
+    'evening': [(time(15, 0), time(23, 30))] * 6 + [(time(15, 0), time(0, 0))],
+    'night': [(time(23, 0), time(7, 30))] * 6 + [(time(0, 0), time(0, 0))],
+    # covers Monday before the first night shift of the week, days afterwards
+    'early_monday': [(time(0, 0), time(7, 30))] + [(time(7, 0), time(15, 30))] * 6,
+}
+# an even split, a week with 25 or more nurses then staffs every block
+default_mix = {'day': 0.25, 'evening': 0.25, 'night': 0.25, 'early_monday': 0.25}
+
+def preset_counts(nurses, mix):
+    """Nurses per preset from the mix shares, largest remainder so the counts add up to nurses"""
+    names = list(mix)
+    shares = np.array([mix[name] for name in names], dtype=float)
+    exact = nurses * shares / shares.sum()
+    counts = np.floor(exact).astype(int)
+    counts[np.argsort(counts - exact)[:nurses - counts.sum()]] += 1
+    return dict(zip(names, counts.tolist()))
+
+def generate_instance(nurses=25, mix=None, tasks=None, window_minutes=(60, 180), durations=(30, 45, 60, 90), staffing=(1, 2), day_off_share=0.1, seed=0):
+    """Personnel and Tasks sheets of a random week in the template format
+
+    Every nurse follows a preset from mix (shares per name in presets) and loses a share of its days
+    at random, keeping at least 5. Tasks are spread evenly over the days, with a start window of a
+    random width within window_minutes (at least the duration plus a handover) between 06:00 and
+    22:00, a duration from durations and a staffing level from the inclusive range staffing.
+    """
+    rng = np.random.default_rng(seed)
+    tasks = nurses // 2 if tasks is None else tasks
+
+    # A nurses in preset order with Nurse_IDs shuffled, days off drawn per nurse
+    rows = []
+    for name, count in preset_counts(nurses, mix or default_mix).items():
+        for _ in range(count):
+            week = list(presets[name])
+            working = [day for day, (start, end) in enumerate(week) if start != end]
+            off = rng.permutation(working)[:min(rng.binomial(len(working), day_off_share), max(len(working) - 5, 0))]
+            for day in off:
+                week[day] = (time(0, 0), time(0, 0))
+            rows.append(week)
+    personnel = pd.DataFrame({'Nurse_ID': rng.permutation(len(rows)) + 1})
+    for day_index, day in enumerate(nrp.weekdays):
+        personnel[f'{day} Start'] = [week[day_index][0] for week in rows]
+        personnel[f'{day} End'] = [week[day_index][1] for week in rows]
+    personnel = personnel.sort_values('Nurse_ID').reset_index(drop=True)
+
+    # B tasks on quarter hours, the window end is the latest start
+    # nurses on shift are all busy during a handover, a window one handover wider than the task always
+    # leaves a start that misses it
+    duration = rng.choice(durations, size=tasks)
+    window_start = rng.integers(6 * 4, 22 * 4 - window_minutes[1] // 15, size=tasks) * 15
+    width = rng.integers(window_minutes[0] // 15, window_minutes[1] // 15 + 1, size=tasks) * 15
+    width = np.maximum(width, duration + nrp.handover_duration * 15)
+    task_df = pd.DataFrame({
+        'Task': [f"T{task + 1}" for task in range(tasks)],
+        'Day': np.arange(tasks) % len(nrp.weekdays) + 1,
+        'Start': [f"{minute // 60:02d}:{minute % 60:02d}" for minute in window_start],
+        'End': [f"{minute // 60:02d}:{minute % 60:02d}" for minute in window_start + width],
+        'Duration (min)': duration,
+        '# Nurses': rng.integers(staffing[0], staffing[1] + 1, size=tasks),
+    })
+    return personnel, task_df
+
+def write_instance(path, **kwargs):
+    """Write a generated week to an Excel file that main reads with type_upload='only'"""
+    personnel, task_df = generate_instance(**kwargs)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        personnel.to_excel(writer, sheet_name='Personnel', index=False)
+        task_df.to_excel(writer, sheet_name='Tasks', index=False)
+
+        # A pandas writes times as text, the template and load_data expect time cells as in Excel
+        sheet = writer.sheets['Personnel']
+        for column_index, column in enumerate(personnel.columns[1:], start=2):
+            for row_index, value in enumerate(personnel[column], start=2):
+                cell = sheet.cell(row=row_index, column=column_index, value=value)
+                cell.number_format = 'h:mm'
+    return path
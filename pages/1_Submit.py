@@ -1,11 +1,18 @@
 import streamlit as st
-from NRP_OBP_D import main
+from feasibility import describe
+from solve_worker import solve_queue
+import io
 import os
 import pandas as pd
+import plotly.express as px
 from datetime import time
+from time import sleep
 
 st.set_page_config(page_title="Nurse Rostering Problem", page_icon="👩‍⚕️", layout="wide")
 
+# ?profile=1 runs the solves of this session under cProfile and tracemalloc, see profiling.py
+profile_runs = st.query_params.get("profile") == "1"
+
 col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
 
 with col1:
@@ -17,6 +24,104 @@ preset_options = ["Kostwinner zonder kinderen", "Kostwinner met kinderen", "Youn
                 "Kids First", "Mantelzorger", "Vrije vogel", "Student"]
 
 
+def show_feasibility_report(model_result):
+    """Intervals and tasks the pre-check found that no schedule can cover"""
+    report = getattr(model_result, '_feasibility_report', None)
+    if report is None:
+        return
+    st.warning(describe(report))
+    if not report['intervals'].empty:
+        st.dataframe(report['intervals'], hide_index=True)
+    if not report['tasks'].empty:
+        st.dataframe(report['tasks'], hide_index=True)
+
+
+def store_result(model_result, input_file=None):
+    """Keep a finished solve for the Output page or explain why there is no schedule"""
+    # Check if model is infeasible
+    if model_result.Status == 3:  # GRB.Status.INFEASIBLE
+        st.error("❌ The scheduling model is infeasible. Please check your input and try again.")
+        show_feasibility_report(model_result)
+        st.session_state.model = None
+        st.session_state.form_submitted = False
+        st.session_state.schedule_generated = False
+    elif model_result.SolCount == 0:
+        st.error("❌ No schedule was found within the time limit. Please increase the time limit and try again.")
+        st.session_state.model = None
+        st.session_state.form_submitted = False
+        st.session_state.schedule_generated = False
+    else:
+        st.session_state.model = model_result
+        st.session_state.run_inputs = st.session_state.get('solve_inputs')
+        st.session_state.scenario_table = None
+        if input_file is not None:
+            st.session_state.input_file = input_file
+            st.session_state.personnel_df_final = pd.read_excel(input_file, sheet_name="Personnel", engine="openpyxl")
+        st.session_state.form_submitted = True
+        st.session_state.schedule_generated = True
+        st.success("✅ Schedule generated successfully! Go to Output page to view results.")
+
+
+def start_solve(file_data, input_file, day_rate, night_rate, type_upload, time_limit, **kwargs):
+    """Queue main for a worker process, the page polls it in show_solve_progress"""
+    st.session_state.solve_job = solve_queue.submit(file_data, day_rate, night_rate, type_upload, time_limit, **kwargs)
+    st.session_state.solve_input_file = input_file
+    # the rate scenarios on the Output page rerun exactly this input, manual entries included
+    st.session_state.solve_inputs = {'file_data': file_data.getvalue(), 'type_upload': type_upload, 'kwargs': kwargs}
+
+
+def show_solve_progress():
+    """Live incumbent, bound and gap of the running solve with buttons to keep the current schedule or cancel"""
+    job = st.session_state.get('solve_job')
+    if job is None:
+        return
+
+    st.markdown("### Solver Progress")
+    accept_col, cancel_col = st.columns(2)
+    with accept_col:
+        if st.button("Accept Current Schedule", help="Stop the solver and keep the best schedule found so far"):
+            job.accept()
+    with cancel_col:
+        if st.button("Cancel", help="Stop the solver and discard the run"):
+            solve_queue.cancel(job)
+            st.session_state.solve_job = None
+            st.info("The solve was cancelled.")
+            return
+
+    # Button clicks rerun the page, the worker keeps running and the loop picks it up again
+    status = st.empty()
+    chart = st.empty()
+    drawn = 0
+    while True:
+        running = solve_queue.poll(job)
+        position = solve_queue.position(job)
+        if position > 0:
+            status.markdown(f"🕒 Waiting for a free solver, position {position} in the queue")
+            sleep(1)
+            continue
+        latest = job.progress[-1] if job.progress else {}
+        incumbent = f"€{latest['incumbent']:,.2f}" if latest.get('incumbent') is not None else "none yet"
+        gap = f"{latest['gap']:.2%}" if latest.get('gap') is not None else "-"
+        status.markdown(f"⏳ Running for {job.elapsed():.0f} s — best schedule: {incumbent}, gap: {gap}, nodes: {latest.get('nodes', 0):,.0f}")
+        if len(job.progress) > drawn:
+            drawn = len(job.progress)
+            progress_df = pd.DataFrame(job.progress)
+            chart.plotly_chart(px.line(progress_df, x='seconds', y=['incumbent', 'bound'], labels={'value': 'Weekly cost (€)', 'seconds': 'Seconds'}), key=f"solve_progress_{drawn}")
+        if not running:
+            break
+        sleep(0.5)
+
+    status.empty()
+    st.session_state.solve_job = None
+    if job.error is not None:
+        st.error(f"❌ Error processing file: {job.error}")
+        st.session_state.model = None
+        st.session_state.form_submitted = False
+        st.session_state.schedule_generated = False
+    else:
+        store_result(job.result, st.session_state.solve_input_file)
+
+
 if 'nurse_entries' not in st.session_state:
     st.session_state.nurse_entries = []
 
@@ -109,6 +214,15 @@ with tab1:
             help="Set the time limit for the scheduling algorithm"
         )
 
+        # Target gap input
+        target_gap = st.number_input(
+            "Target Gap (%)",
+            min_value=0.0,
+            value=0.0,
+            step=0.5,
+            help="Stop as soon as the schedule is within this percentage of the lower bound on the weekly cost"
+        )
+
         # Submit button
         submitted = st.form_submit_button("Generate Schedule")
 
@@ -119,28 +233,8 @@ with tab1:
             elif not agree:
                 st.warning("⚠️ Please confirm the input file format")
             else:
-                with st.spinner('Generating optimal schedule...'):
-                    try:
-                        model_result = main(uploaded_file, day_rate, night_rate, "only", time_limit)
-                        
-                        # Check if model is infeasible
-                        if model_result.Status == 3:  # GRB.Status.INFEASIBLE
-                            st.error("❌ The scheduling model is infeasible. Please check your input and try again.")
-                            st.session_state.model = None
-                            st.session_state.form_submitted = False
-                            st.session_state.schedule_generated = False
-                        else:
-                            st.session_state.model = model_result
-                            st.session_state.input_file = uploaded_file
-                            st.session_state.personnel_df_final = pd.read_excel(uploaded_file, sheet_name="Personnel", engine="openpyxl")
-                            st.session_state.form_submitted = True
-                            st.session_state.schedule_generated = True
-                            st.success("✅ Schedule generated successfully! Go to Output page to view results.")
-                    except Exception as e:
-                        st.error(f"❌ Error processing file: {str(e)}")
-                        st.session_state.model = None
-                        st.session_state.form_submitted = False
-                        st.session_state.schedule_generated = False
+                # Solve in a worker process so the page stays responsive, the progress is shown below
+                start_solve(io.BytesIO(uploaded_file.getvalue()), uploaded_file, day_rate, night_rate, "only", time_limit, target_gap=target_gap / 100 or None, profile=profile_runs)
 with tab2:
     st.markdown("### Manual Data Entry")
     
@@ -201,6 +295,15 @@ with tab2:
         help="Set the time limit for the scheduling algorithm"
     )
 
+    # Target gap input
+    target_gap = st.number_input(
+        "Target Gap (%)",
+        min_value=0.0,
+        value=0.0,
+        step=0.5,
+        help="Stop as soon as the schedule is within this percentage of the lower bound on the weekly cost"
+    )
+
 
    # Preset selection
     presets = {
@@ -412,31 +515,15 @@ with tab2:
                 temp_df.to_excel(writer, sheet_name='Personnel', index=False)
                 tasks_df.to_excel(writer, sheet_name='Tasks', index=False)
 
-            with st.spinner('Generating optimal schedule...'):
-                try:
-                    model_result = main("temp_data.xlsx", day_rate, night_rate, "nothing", time_limit)
-                    
-                    # Check if model is infeasible
-                    if model_result.Status == 3:  # GRB.Status.INFEASIBLE
-                        st.error("❌ The scheduling model is infeasible. Please check your input and try again.")
-                        st.session_state.model = None
-                        st.session_state.form_submitted = False
-                        st.session_state.schedule_generated = False
-                    else:
-                        st.session_state.model = model_result
-                        st.session_state.form_submitted = True
-                        st.session_state.schedule_generated = True
-                        st.success("✅ Schedule generated successfully! Go to Output page to view results.")
-                except Exception as e:
-                    st.error(f"❌ Error processing data: {str(e)}")
-                    st.session_state.model = None
-                    st.session_state.form_submitted = False
-                    st.session_state.schedule_generated = False
-                finally:
-                    # Clean up temporary file
-                    os.remove("temp_data.xlsx")
+            # The worker gets the bytes, so the temporary file can go right away
+            with open("temp_data.xlsx", "rb") as file:
+                file_data = io.BytesIO(file.read())
+            os.remove("temp_data.xlsx")
+            start_solve(file_data, None, day_rate, night_rate, "nothing", time_limit, target_gap=target_gap / 100 or None, profile=profile_runs)
         else:
             if not agree:
                 st.warning("⚠️ Please confirm the input file format")
             else:
                 st.error("Please add nurses before generating the schedule")
+
+show_solve_progress()
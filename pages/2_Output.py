@@ -1,11 +1,54 @@
 import streamlit as st
+import io
 import pandas as pd
 from functions import calendar_creator, handle_view_change, create_excel_schedule
+from scenarios import run_scenarios
+from NRP_OBP_D import solution_costs, activity_measures, solution_gap
 import plotly.express as px
+from time import perf_counter, sleep
+from solve_worker import solve_queue
+from telemetry import log_phase
+import profiling
 
 # Configure page
 st.set_page_config(page_title="Schedule Output", layout="wide")
 
+# ?profile=1 profiles the calendar and the cost analysis of this session, see profiling.py
+profiling.request(st.query_params.get("profile") == "1")
+
+
+
+def show_scenario_progress():
+    """Poll the rate scenario job in the shared solve queue, with a button to cancel it"""
+    job = st.session_state.get('scenario_job')
+    if job is None:
+        return
+    if st.button("Cancel Scenarios"):
+        solve_queue.cancel(job)
+        st.session_state.scenario_job = None
+        st.info("The rate scenarios were cancelled.")
+        return
+
+    status = st.empty()
+    while solve_queue.poll(job):
+        position = solve_queue.position(job)
+        latest = job.progress[-1] if job.progress else None
+        if position > 0:
+            status.markdown(f"🕒 Waiting for a free solver, position {position} in the queue")
+        elif latest is None:
+            status.markdown(f"⏳ Solving the first rate scenario, running for {job.elapsed():.0f} s")
+        else:
+            status.markdown(f"⏳ Solved {latest['scenario']} of {latest['scenarios']} rate scenarios in {latest['seconds']:.0f} s")
+        sleep(0.5)
+
+    status.empty()
+    st.session_state.scenario_job = None
+    if job.error is not None:
+        st.error(f"❌ Error solving the rate scenarios: {job.error}")
+    else:
+        st.session_state.scenario_table = job.result
+
+
 # Validate state
 if not st.session_state.get('schedule_generated', False):
     st.warning("⚠️ Please generate a schedule in the Submit page first.")
@@ -60,12 +103,21 @@ try:
             st.session_state.last_calendar_type = calendar_type
             st.rerun()
 
-        # Create calendar with appropriate type
+        # Create calendar with appropriate type, its time goes to the telemetry log of the run
+        calendar_start = perf_counter()
         calendar, nurse_shifts, break_shifts, overdracht1, overdracht2 = calendar_creator(
             model=model,
             calendar_type=calendar_type.split()[0].lower(),  # "total", "shift", or "task"  
             task_sheet_df=task_sheet_df
         )
+        calendar_seconds = perf_counter() - calendar_start
+
+        # Every widget change reruns the page, only the first calendar of a run goes to the log
+        run_id = model._telemetry['run_id'] if getattr(model, '_telemetry', None) else None
+        logged_runs = st.session_state.setdefault('logged_calendar_runs', set())
+        if run_id is not None and run_id not in logged_runs:
+            log_phase(model, 'calendar_creator', calendar_seconds)
+            logged_runs.add(run_id)
 
         st.write(calendar)
 
@@ -91,20 +143,10 @@ try:
         # Cost Analysis Section
         st.markdown("### Cost Analysis")
         
-        # Calculate costs
-        daily_costs = [0] * 7
-        total_costs = 0
-        
-        for var in model.getVars():
-            if 'salary_per_interval' in var.varName and var.x > 0:
-                try:
-                    interval = int(var.varName.split('[')[1].split(']')[0])
-                    day_index = interval // 96  # 96 intervals per day
-                    if 0 <= day_index < 7:
-                        daily_costs[day_index] += var.x
-                        total_costs += var.x
-                except (IndexError, ValueError):
-                    continue
+        # Calculate costs from the scheduled shifts and the interval rates
+        _, daily_costs = solution_costs(model)
+        daily_costs = daily_costs.tolist()
+        total_costs = sum(daily_costs)
 
         # Display cost metrics
         cost_cols = st.columns(3)
@@ -120,6 +162,15 @@ try:
             highest_cost = max(daily_costs)
             st.metric("Highest Daily Cost", f"€{highest_cost:,.2f}")
 
+        # Distance of the schedule to the best lower bound on the weekly cost
+        _, lower_bound, gap = solution_gap(model)
+        if lower_bound is not None:
+            gap_cols = st.columns(3)
+            with gap_cols[0]:
+                st.metric("Lower Bound on Weekly Cost", f"€{lower_bound:,.2f}")
+            with gap_cols[1]:
+                st.metric("Achieved Gap", f"{gap:.2%}")
+
         # Daily cost breakdown
         st.markdown("### Daily Cost Breakdown")
         weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -146,9 +197,10 @@ try:
         
         
         # Activity measures
-        total_nurses_present_value = model.getVarByName("total_nurses_present").X
-        total_nurses_with_tasks_value = model.getVarByName("total_nurses_tasks").X
-        total_nurses_active_value = model.getVarByName("total_nurses_active").X
+        activity = activity_measures(model)
+        total_nurses_present_value = activity['total_nurses_present']
+        total_nurses_with_tasks_value = activity['total_nurses_tasks']
+        total_nurses_active_value = activity['total_nurses_active']
 
         # Calculate the ratios
         if total_nurses_present_value > 0:
@@ -168,6 +220,75 @@ try:
         with activity_cols[1]:
             st.metric("Ratio of nurses actively working (including handovers)", f"{active_ratio:.2f}")
 
+        # Rate scenarios, the model is built once and only the salary rates change
+        st.markdown("### Rate Scenarios")
+        scenario_rates = st.data_editor(
+            pd.DataFrame({'Day rate (€/hour)': [15.0, 17.5], 'Night rate (€/hour)': [20.0, 25.0]}),
+            num_rows="dynamic",
+            key="scenario_rates"
+        )
+        scenario_time_limit = st.number_input(
+            "Time Limit per Scenario (seconds)",
+            min_value=1,
+            value=60,
+            step=1,
+            help="Set the time limit for every rate scenario"
+        )
+        if st.button("Compare Scenarios"):
+            run_inputs = st.session_state.get('run_inputs')
+            if run_inputs is None:
+                st.error("❌ The input of this schedule is no longer available, generate the schedule again to compare scenarios.")
+            else:
+                # Same input, builder, formulation and solver as the schedule above, every scenario sets its own day/night rates
+                run_info = model._telemetry['info'] if getattr(model, '_telemetry', None) else run_inputs['kwargs']
+                options = {key: run_info[key] for key in ('builder', 'formulation', 'solver') if run_info.get(key) is not None}
+                st.session_state.scenario_job = solve_queue.submit(
+                    io.BytesIO(run_inputs['file_data']), scenario_rates.dropna().to_numpy().tolist(), run_inputs['type_upload'],
+                    scenario_time_limit, function=run_scenarios, **options
+                )
+        show_scenario_progress()
+
+        if st.session_state.get('scenario_table') is not None:
+            scenario_table = st.session_state.scenario_table
+            st.dataframe(scenario_table, use_container_width=True, hide_index=True)
+            scenario_df = pd.DataFrame({
+                'Scenario': [f"€{day:g} / €{night:g}" for day, night in zip(scenario_table['day_salary'], scenario_table['night_salary'])],
+                'Cost': scenario_table['total']
+            })
+            fig = px.bar(scenario_df, x='Scenario', y='Cost',
+                        title='Weekly Cost per Rate Scenario (day / night rate)',
+                        labels={'Cost': 'Cost (€)'},
+                        color='Cost')
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Where the time of the run went, per phase, with the model size and the solver log
+    run_telemetry = getattr(model, '_telemetry', None)
+    if run_telemetry is not None:
+        with st.expander("Diagnostics"):
+            phases_df = pd.DataFrame(run_telemetry['phases'] + [{'phase': 'calendar_creator', 'seconds': calendar_seconds}])
+            st.dataframe(phases_df, use_container_width=True, hide_index=True)
+
+            solve = run_telemetry['solve']
+            diagnostic_cols = st.columns(4)
+            with diagnostic_cols[0]:
+                st.metric("Total Run Time", f"{run_telemetry['seconds']:.2f} s")
+            with diagnostic_cols[1]:
+                st.metric("Root LP Time", f"{solve['root_lp_seconds']:.2f} s" if solve.get('root_lp_seconds') is not None else "-")
+            with diagnostic_cols[2]:
+                st.metric("Nodes", f"{solve['nodes']:,.0f}")
+            with diagnostic_cols[3]:
+                st.metric("Final Gap", f"{solve['gap']:.2%}" if solve['gap'] is not None else "-")
+
+            if run_telemetry['model'] is not None:
+                st.markdown("**Model size**")
+                st.json(run_telemetry['model'])
+            if solve.get('presolve') is not None:
+                st.markdown("**Presolve reductions**")
+                st.json(solve['presolve'])
+            if solve.get('incumbents'):
+                st.markdown("**Incumbent timeline**")
+                st.plotly_chart(px.line(pd.DataFrame(solve['incumbents']), x='seconds', y='objective', markers=True, labels={'objective': 'Weekly cost (€)', 'seconds': 'Seconds'}), use_container_width=True)
+
 except Exception as e:
     st.error(f"❌ Error displaying schedule: {str(e)}")
     st.stop()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from functools import wraps
+from contextlib import contextmanager
+
+profile_dir = os.path.join('logs', 'profiles')
+
+# the Streamlit sessions run in their own threads, so a ?profile=1 page only profiles its own run
+_local = threading.local()
+
+def request(flag):
+    """Turn profiling on or off for the calling thread, e.g. from a ?profile=1 query parameter"""
+    _local.requested = bool(flag)
+
+def enabled():
+    """Profiling is on when NRP_PROFILE is set to anything but 0/false/no, or when the thread requested it"""
+    return os.environ.get('NRP_PROFILE', '').lower() not in ('', '0', 'false', 'no') or getattr(_local, 'requested', False)
+
+@contextmanager
+def profiled(name):
+    """cProfile and tracemalloc around the block, saved as <time>_<name>_<pid>.prof and .snapshot in profile_dir
+
+    The .prof file opens with pstats or snakeviz, the snapshot with tracemalloc.Snapshot.load.
+    A block inside another profiled block is part of the outer profile.
+    """
+    if not enabled() or getattr(_local, 'active', False):
+        yield
+        return
+
+    # A tracemalloc may already run for someone else, then it is left running afterwards
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    _local.active = True
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        _local.active = False
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+
+        # B one pair of files per call, the summary line gives the numbers without opening them
+        os.makedirs(profile_dir, exist_ok=True)
+        base = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{os.getpid()}")
+        profiler.dump_stats(base + '.prof')
+        snapshot.dump(base + '.snapshot')
+        calls = pstats.Stats(profiler).total_calls
+        print(f"Profiled {name}: {seconds:.3f} s, {calls} calls, peak traced memory {peak / 1024 ** 2:.1f} MB -> {base}.prof/.snapshot")
+
+def profile(name):
+    """Decorator that runs the function under profiled(name) when profiling is enabled"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with profiled(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def top_allocations(snapshot_path, limit=10):
+    """Lines of code with the most memory still allocated in a saved snapshot"""
+    snapshot = tracemalloc.Snapshot.load(snapshot_path)
+    return [(str(stat.traceback), stat.size, stat.count) for stat in snapshot.statistics('lineno')[:limit]]
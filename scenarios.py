@@ -0,0 +1,92 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import heuristic
+import NRP_OBP_D as nrp
+from solver_backends import solvers
+
+def update_rates(model, day_salary, night_salary, rate_table=None):
+    """Set the salary of every shift as the objective coefficient of its shift_scheduled variable"""
+    model.update()
+    interval_rate = nrp.interval_rates(day_salary, night_salary, rate_table)
+    shift_cost = nrp.shift_costs(model._shift_df, interval_rate)
+    shifts = [model.getVarByName(f"shift_scheduled[{shift}]") for shift in range(len(shift_cost))]
+    model.setAttr('Obj', shifts, shift_cost.tolist())
+    model._interval_rate = interval_rate
+    model.update()
+
+def scenario_row(result, day_salary, night_salary, runtime):
+    """Cost per day and week of one solved scenario"""
+    row = {'day_salary': day_salary, 'night_salary': night_salary, 'status': result.Status, 'seconds': runtime}
+    solved = result.SolCount > 0
+    day_costs = nrp.solution_costs(result)[1] if solved else [None] * len(nrp.weekdays)
+    for day, cost in zip(nrp.weekdays, day_costs):
+        row[day] = cost
+    row['total'] = sum(day_costs) if solved else None
+    return row
+
+def solve_scenarios(tasks_df, shift_df, rates, time_limit=300, builder='matrix', formulation=None, solver='gurobi', threads=None, progress=None):
+    """Build the model once and solve it for every (day_salary, night_salary) pair
+
+    Only the objective coefficients of shift_scheduled change between the scenarios. On Gurobi the
+    solution of the previous scenario is the MIP start of the next one, the heuristic builds no
+    model and runs once per pair. progress(update) hears about every finished scenario, a true
+    reply skips the remaining ones.
+    """
+    # A the first scenario sets the real shift costs
+    model = None
+    if solver != 'heuristic':
+        model = nrp.build_model(tasks_df, shift_df, 1.0, 1.0, time_limit, builder, formulation or nrp.default_formulation(solver))
+        nrp.lint_model(model)
+        if threads is not None:
+            model.setParam('Threads', threads)
+        model.update()
+        variables = model.getVars()
+
+    rows = []
+    previous = None
+    sweep_start = time.perf_counter()
+    for scenario, (day_salary, night_salary) in enumerate(rates):
+        solve_start = time.perf_counter()
+        if model is None:
+            result = heuristic.heuristic_solution(tasks_df, shift_df, day_salary, night_salary)
+        else:
+            update_rates(model, day_salary, night_salary)
+            if solver == 'gurobi' and previous is not None:
+                model.setAttr('Start', variables, previous)
+            elif solver == 'gurobi':
+                schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary)
+                if schedule is not None:
+                    heuristic.set_mip_start(model, schedule)
+            result = solvers[solver](model)
+        rows.append(scenario_row(result, day_salary, night_salary, time.perf_counter() - solve_start))
+        if solver == 'gurobi' and result.SolCount > 0:
+            previous = model.getAttr('X', variables)
+
+        # B a stopped sweep keeps the scenarios it finished
+        if progress is not None and progress({'scenario': scenario + 1, 'scenarios': len(rates), 'seconds': time.perf_counter() - sweep_start}):
+            break
+    return pd.DataFrame(rows)
+
+def run_scenarios(file_path, rates, type_upload='only', time_limit=300, builder='matrix', formulation=None, solver='gurobi', workers=1, threads=None, progress=None):
+    """Cost table for several rate pairs from one read of the input file, optionally over a process pool
+
+    Takes the builder, formulation and solver of the run it is compared with, so the costs match
+    the schedule. progress only hears from the sweep without a pool, as in a solve_worker job.
+    """
+    tasks_df, shift_df = nrp.load_data(file_path, type_upload)
+    shift_df = nrp.filter_shifts(shift_df)
+    rates = [(float(day_salary), float(night_salary)) for day_salary, night_salary in rates]
+    if workers <= 1 or len(rates) <= 1:
+        return solve_scenarios(tasks_df, shift_df, rates, time_limit, builder, formulation, solver, threads, progress)
+
+    # B every worker builds its own model and warm starts along its share of the rate pairs
+    chunks = [rates[i::workers] for i in range(min(workers, len(rates)))]
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(solve_scenarios, tasks_df, shift_df, chunk, time_limit, builder, formulation, solver, threads) for chunk in chunks]
+        tables = [future.result() for future in futures]
+    order = {pair: i for i, pair in enumerate(rates)}
+    table = pd.concat(tables, ignore_index=True)
+    table['order'] = [order[pair] for pair in zip(table['day_salary'], table['night_salary'])]
+    return table.sort_values('order').drop(columns='order').reset_index(drop=True)
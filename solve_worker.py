@@ -0,0 +1,222 @@
+import os
+import time
+import queue
+import hashlib
+import threading
+import multiprocessing
+import gurobipy as gp
+import NRP_OBP_D as nrp
+import profiling
+from solver_backends import ScheduleSolution
+
+def detach(result):
+    """Copy of a solved model that can leave the worker process, a Gurobi model becomes a ScheduleSolution"""
+    if not isinstance(result, gp.Model):
+        return result
+    if result.SolCount > 0:
+        variables = result.getVars()
+        solution = ScheduleSolution(
+            result.getAttr('VarName', variables), result.getAttr('X', variables), result.Status,
+            result.ObjVal, result.ObjBound, result.Runtime, result.NodeCount, source=result
+        )
+    else:
+        solution = ScheduleSolution([], [], result.Status, runtime=result.Runtime, source=result)
+    for name in ('_lower_bound', '_telemetry', '_feasibility_report', '_warm_start_report', '_size_report', '_lint_report', '_tighten_report'):
+        if getattr(result, name, None) is not None:
+            setattr(solution, name, getattr(result, name))
+    return solution
+
+def solve(file_path, args, kwargs, updates, stop, heartbeat, profile=False, grace=30, function=None):
+    """Run main, or function with the same call signature, in the worker process and send its progress and result to the page"""
+    profiling.request(profile)
+    def report(update):
+        updates.put(('progress', update))
+        # the page beats while it is open, a closed tab stops the solve after grace seconds
+        return stop.is_set() or time.time() - heartbeat.value > grace
+
+    try:
+        result = detach((function or nrp.main)(file_path, *args, progress=report, **kwargs))
+    except Exception as e:
+        updates.put(('error', str(e)))
+        return
+    if time.time() - heartbeat.value > grace:
+        # nobody reads the queue anymore, exit without waiting for the result to be picked up
+        updates.cancel_join_thread()
+        return
+    updates.put(('done', result))
+
+class SolveJob:
+    """main(...) running in a separate process, polled by the page for progress and the final result
+
+    function replaces main by another module level function that takes the file first and a
+    progress callback, e.g. scenarios.run_scenarios.
+    """
+    def __init__(self, file_path, *args, profile=False, function=None, **kwargs):
+        self.context = multiprocessing.get_context('spawn')
+        self.file_path = file_path
+        self.args = args
+        self.kwargs = kwargs
+        self.profile = profile
+        self.function = function
+        self.updates = self.context.Queue()
+        self.stop = self.context.Event()
+        self.heartbeat = self.context.Value('d', time.time())
+        self.progress = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        self.started = None
+        self.process = None
+
+    def start(self, threads=None):
+        """Start the worker process, threads caps the Gurobi threads of the solve"""
+        kwargs = self.kwargs if threads is None else {**self.kwargs, 'threads': threads}
+        self.threads = threads
+        self.started = time.time()
+        self.heartbeat.value = self.started
+        self.process = self.context.Process(
+            target=solve, args=(self.file_path, self.args, kwargs, self.updates, self.stop, self.heartbeat, self.profile),
+            kwargs={'function': self.function}, daemon=True
+        )
+        self.process.start()
+
+    def poll(self, beat=True):
+        """Take every message the worker sent since the last poll, returns True while the solve waits or runs
+
+        Only the page that owns the job beats, so a solve nobody looks at anymore stops.
+        """
+        if beat:
+            self.heartbeat.value = time.time()
+        if self.process is None:
+            return not self.done
+        while not self.done:
+            try:
+                kind, message = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.progress.append(message)
+            elif kind == 'done':
+                self.result, self.done = message, True
+            else:
+                self.error, self.done = message, True
+
+        # A a worker that gave up on a closed page or was killed by the operating system
+        if not self.done and not self.process.is_alive() and self.updates.empty():
+            reason = "the page stopped polling it" if self.process.exitcode == 0 else f"exit code {self.process.exitcode}"
+            self.error, self.done = f"The solver process stopped without a result ({reason})", True
+        if self.done:
+            self.process.join(timeout=5)
+        return not self.done
+
+    def elapsed(self):
+        """Seconds since the job started, 0 while it waits in the queue"""
+        return time.time() - self.started if self.started is not None else 0.0
+
+    def accept(self):
+        """Stop the search and keep the best schedule found so far"""
+        self.stop.set()
+
+    def cancel(self):
+        """Stop the worker and throw the run away"""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout=5)
+        self.error, self.done, self.cancelled = "The solve was cancelled", True, True
+
+def input_key(file_path, args, kwargs):
+    """Hash of the input file and the arguments of main, identical submissions get the same key"""
+    if hasattr(file_path, 'getvalue'):
+        data = file_path.getvalue()
+    else:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+    digest = hashlib.sha256(data)
+    digest.update(repr((args, sorted(kwargs.items()))).encode())
+    return digest.hexdigest()
+
+class SolveQueue:
+    """Solve jobs of every session on this server, at most max_running at a time with the free cores split between the jobs that start
+
+    Identical submissions share one job. Finished jobs stay available for a resubmission of the
+    same input until keep_finished newer jobs have finished; failed or cancelled jobs are dropped.
+    """
+    def __init__(self, max_running=2, cores=None, keep_finished=20, grace=30):
+        self.max_running = max_running
+        self.cores = cores or os.cpu_count() or 1
+        self.keep_finished = keep_finished
+        self.grace = grace
+        self.jobs = {}
+        self.waiting = []
+        self.running = []
+        self.finished = []
+        self.lock = threading.Lock()
+
+    def submit(self, file_path, *args, profile=False, function=None, **kwargs):
+        """Queue main(file_path, *args, **kwargs) or return the job of an identical earlier submission, profile runs it under the profiling hooks"""
+        key = input_key(file_path, args, {**kwargs, 'profile': profile, 'function': getattr(function, '__name__', 'main')})
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                job = SolveJob(file_path, *args, profile=profile, function=function, **kwargs)
+                job.key = key
+                job.subscribers = 0
+                self.jobs[key] = job
+                self.waiting.append(job)
+            job.subscribers += 1
+            job.heartbeat.value = time.time()
+            self._update()
+        return job
+
+    def poll(self, job):
+        """Start waiting jobs when a slot is free and take the messages of job, returns True while it waits or runs"""
+        with self.lock:
+            running = job.poll()
+            self._update()
+        return running
+
+    def position(self, job):
+        """Place of the job in the queue, 0 once it runs"""
+        with self.lock:
+            return self.waiting.index(job) + 1 if job in self.waiting else 0
+
+    def cancel(self, job):
+        """Leave the job, it is only stopped once no other session waits for it"""
+        with self.lock:
+            job.subscribers -= 1
+            if job.subscribers <= 0:
+                job.cancel()
+                self._update()
+
+    def _update(self):
+        # A jobs that finished free their slot, only schedules stay available for resubmissions
+        for job in [job for job in self.running if not job.poll(beat=False)]:
+            self.running.remove(job)
+            if job.error is None:
+                self.finished.append(job)
+            elif self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+        while len(self.finished) > self.keep_finished:
+            old = self.finished.pop(0)
+            if self.jobs.get(old.key) is old:
+                del self.jobs[old.key]
+
+        # B waiting jobs nobody polls anymore or that were cancelled leave the queue
+        now = time.time()
+        for job in [job for job in self.waiting if job.done or now - job.heartbeat.value > self.grace]:
+            self.waiting.remove(job)
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+
+        # C starting jobs split the cores the running jobs leave free, so a job that runs alone gets every core
+        # a solve keeps its threads until it ends, a job starting next to it gets what is left and at least 1
+        starting = self.waiting[:max(self.max_running - len(self.running), 0)]
+        free = self.cores - sum(job.threads or 0 for job in self.running)
+        for job in starting:
+            self.waiting.remove(job)
+            job.start(max(1, free // len(starting)))
+            self.running.append(job)
+
+# one queue for every session of the Streamlit server
+solve_queue = SolveQueue()
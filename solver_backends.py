@@ -0,0 +1,208 @@
+import time
+import numpy as np
+import gurobipy as gp
+from scipy.optimize import milp, linprog, LinearConstraint, Bounds
+
+# scipy.optimize.milp status codes mapped to the Gurobi status codes the pages check
+milp_status = {
+    0: gp.GRB.OPTIMAL,
+    1: gp.GRB.TIME_LIMIT,
+    2: gp.GRB.INFEASIBLE,
+    3: gp.GRB.UNBOUNDED,
+    4: gp.GRB.NUMERIC,
+}
+
+class SolutionVar:
+    """Solved variable with the name and value attributes the output pages read"""
+    def __init__(self, name, value):
+        self.varName = name
+        self.VarName = name
+        self.x = value
+        self.X = value
+
+class ScheduleSolution:
+    """Solution of a scheduling model that looks like a solved Gurobi model to the output pages"""
+    def __init__(self, names, values, status, objective=None, bound=None, runtime=0.0, nodes=0, source=None):
+        self._vars = [SolutionVar(name, value) for name, value in zip(names, values)]
+        self._by_name = {var.varName: var for var in self._vars}
+        self.Status = status
+        self.SolCount = 1 if self._vars else 0
+        self.ObjVal = objective
+        self.ObjBound = bound
+        self.Runtime = runtime
+        self.NodeCount = nodes
+        self.MIPGap = abs(objective - bound) / max(abs(objective), 1e-10) if objective is not None and bound is not None else None
+
+        # carry the input data so the calendar can map the solution back
+        if source is not None:
+            carry_input(self, getattr(source, '_formulation', 'full'), getattr(source, '_shift_df', None), getattr(source, '_tasks_df', None), getattr(source, '_interval_rate', None))
+
+    def getVars(self):
+        return self._vars
+
+    def getVarByName(self, name):
+        return self._by_name.get(name)
+
+def carry_input(solution, formulation, shift_df, tasks_df, interval_rate):
+    """Keep the formulation, the input data and the interval rates on a solution, the calendar and the cost analysis read them"""
+    solution._formulation = formulation
+    solution._shift_df = shift_df
+    solution._tasks_df = tasks_df
+    solution._interval_rate = interval_rate
+    return solution
+
+def solve_callback(model, where):
+    """Log presolve reductions, root LP time and incumbents in model._solve_log and report progress to model._progress
+
+    A true reply of model._progress stops the solve with the incumbent.
+    """
+    log = model._solve_log
+    if where == gp.GRB.Callback.PRESOLVE:
+        log['presolve'] = {
+            'columns_removed': model.cbGet(gp.GRB.Callback.PRE_COLDEL),
+            'rows_removed': model.cbGet(gp.GRB.Callback.PRE_ROWDEL),
+            'senses_changed': model.cbGet(gp.GRB.Callback.PRE_SENCHG),
+            'bounds_changed': model.cbGet(gp.GRB.Callback.PRE_BNDCHG),
+            'coefficients_changed': model.cbGet(gp.GRB.Callback.PRE_COECHG),
+        }
+        return
+    if where == gp.GRB.Callback.MIPNODE:
+        # the first node callback comes once the root LP is solved
+        if log['root_lp_seconds'] is None:
+            log['root_lp_seconds'] = model.cbGet(gp.GRB.Callback.RUNTIME)
+        return
+    if where == gp.GRB.Callback.MIPSOL:
+        best, bound, nodes = (model.cbGet(what) for what in (gp.GRB.Callback.MIPSOL_OBJBST, gp.GRB.Callback.MIPSOL_OBJBND, gp.GRB.Callback.MIPSOL_NODCNT))
+        log['incumbents'].append({'seconds': model.cbGet(gp.GRB.Callback.RUNTIME), 'objective': model.cbGet(gp.GRB.Callback.MIPSOL_OBJ)})
+    elif where == gp.GRB.Callback.MIP:
+        best, bound, nodes = (model.cbGet(what) for what in (gp.GRB.Callback.MIP_OBJBST, gp.GRB.Callback.MIP_OBJBND, gp.GRB.Callback.MIP_NODCNT))
+    else:
+        return
+    if getattr(model, '_progress', None) is None:
+        return
+
+    # A MIP callbacks come many times a second, new incumbents always go out and the rest twice a second
+    seconds = model.cbGet(gp.GRB.Callback.RUNTIME)
+    if where == gp.GRB.Callback.MIP and seconds - model._last_progress < 0.5:
+        return
+    model._last_progress = seconds
+
+    # B the salary lower bound counts when it is better than the bound of the tree
+    incumbent = best if abs(best) < gp.GRB.INFINITY else None
+    bound = bound if abs(bound) < gp.GRB.INFINITY else None
+    if getattr(model, '_lower_bound', None) is not None:
+        bound = model._lower_bound if bound is None else max(bound, model._lower_bound)
+    gap = abs(incumbent - bound) / max(abs(incumbent), 1e-10) if incumbent is not None and bound is not None else None
+    if model._progress({'seconds': seconds, 'incumbent': incumbent, 'bound': bound, 'gap': gap, 'nodes': nodes}):
+        model.terminate()
+
+def solve_gurobi(model):
+    """Optimize the model with Gurobi and return it as the solution, with the search logged in model._solve_log"""
+    model._solve_log = {'presolve': None, 'root_lp_seconds': None, 'incumbents': []}
+    model._last_progress = -1.0
+    model.optimize(solve_callback)
+    return model
+
+def solve_highs(model):
+    """Solve a linear scheduling model with HiGHS through scipy.optimize.milp"""
+    model.update()
+    if model.NumQConstrs > 0:
+        raise ValueError("The HiGHS backend needs a linear model, use formulation='pulse'")
+
+    variables = model.getVars()
+    constraints = model.getConstrs()
+    names = model.getAttr('VarName', variables)
+
+    # A objective, bounds and integrality, Gurobi stores infinity as 1e100
+    sense = 1 if model.ModelSense == gp.GRB.MINIMIZE else -1
+    objective = sense * np.array(model.getAttr('Obj', variables))
+    lower = np.array(model.getAttr('LB', variables))
+    upper = np.array(model.getAttr('UB', variables))
+    lower[lower <= -gp.GRB.INFINITY] = -np.inf
+    upper[upper >= gp.GRB.INFINITY] = np.inf
+    integrality = np.isin(model.getAttr('VType', variables), ['B', 'I']).astype(int)
+
+    # B constraint rows as a CSR matrix with row bounds
+    A = model.getA().tocsr()
+    senses = np.array(model.getAttr('Sense', constraints))
+    rhs = np.array(model.getAttr('RHS', constraints))
+    row_lower = np.where(senses == '<', -np.inf, rhs)
+    row_upper = np.where(senses == '>', np.inf, rhs)
+
+    options = {'disp': bool(model.Params.OutputFlag), 'mip_rel_gap': model.Params.MIPGap}
+    if model.Params.TimeLimit < gp.GRB.INFINITY:
+        options['time_limit'] = model.Params.TimeLimit
+
+    solve_start = time.perf_counter()
+    result = milp(
+        objective,
+        constraints=LinearConstraint(A, row_lower, row_upper),
+        integrality=integrality,
+        bounds=Bounds(lower, upper),
+        options=options,
+    )
+    runtime = time.perf_counter() - solve_start
+
+    status = milp_status.get(result.status, gp.GRB.NUMERIC)
+    if result.x is None:
+        return ScheduleSolution([], [], status, runtime=runtime, source=model)
+
+    # round integer variables so binaries compare equal to 1 on the output pages
+    values = np.where(integrality == 1, np.round(result.x), result.x)
+    objective_value = sense * result.fun + model.ObjCon
+    bound = getattr(result, 'mip_dual_bound', None)
+    if bound is not None:
+        bound = sense * bound + model.ObjCon
+    return ScheduleSolution(
+        names, values, status, objective_value, bound, runtime,
+        getattr(result, 'mip_node_count', 0), source=model
+    )
+
+def relax_gurobi(model):
+    """Solve the LP relaxation with Gurobi, returns the objective, the values and the constraint duals"""
+    relaxed = model.relax()
+    relaxed.optimize()
+    if relaxed.Status != gp.GRB.OPTIMAL:
+        return None, None, None
+    return relaxed.ObjVal, np.array(relaxed.getAttr('X', relaxed.getVars())), np.array(relaxed.getAttr('Pi', relaxed.getConstrs()))
+
+def relax_highs(model):
+    """Solve the LP relaxation with HiGHS through scipy.optimize.linprog, duals use the Gurobi Pi sign convention"""
+    model.update()
+    if model.NumQConstrs > 0:
+        raise ValueError("The HiGHS backend needs a linear model, use formulation='pulse'")
+    variables = model.getVars()
+    constraints = model.getConstrs()
+    sense = 1 if model.ModelSense == gp.GRB.MINIMIZE else -1
+    objective = sense * np.array(model.getAttr('Obj', variables))
+    lower = np.array(model.getAttr('LB', variables))
+    upper = np.array(model.getAttr('UB', variables))
+    lower[lower <= -gp.GRB.INFINITY] = -np.inf
+    upper[upper >= gp.GRB.INFINITY] = np.inf
+
+    # A '>' rows are negated into A_ub, so their duals flip sign again afterwards
+    A = model.getA().tocsr()
+    senses = np.array(model.getAttr('Sense', constraints))
+    rhs = np.array(model.getAttr('RHS', constraints))
+    flip = np.where(senses == '>', -1.0, 1.0)
+    inequality = senses != '='
+    result = linprog(
+        objective,
+        A_ub=A[inequality].multiply(flip[inequality][:, None]).tocsr() if inequality.any() else None,
+        b_ub=(rhs * flip)[inequality] if inequality.any() else None,
+        A_eq=A[~inequality] if (~inequality).any() else None,
+        b_eq=rhs[~inequality] if (~inequality).any() else None,
+        bounds=np.column_stack([lower, upper]),
+        method='highs',
+    )
+    if result.status != 0:
+        return None, None, None
+    duals = np.zeros(len(constraints))
+    if inequality.any():
+        duals[inequality] = result.ineqlin.marginals * flip[inequality]
+    if (~inequality).any():
+        duals[~inequality] = result.eqlin.marginals
+    return sense * result.fun + model.ObjCon, result.x, sense * duals
+
+solvers = {'gurobi': solve_gurobi, 'highs': solve_highs}
+relaxations = {'gurobi': relax_gurobi, 'highs': relax_highs}
@@ -0,0 +1,171 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import gurobipy as gp
+import heuristic
+import NRP_OBP_D as nrp
+from solver_backends import solvers, ScheduleSolution, carry_input
+
+def nurse_types(shift_df):
+    """Type of every nurse, nurses with exactly the same available (Day, Start, End) shifts share a type"""
+    availability = shift_df.groupby('Nurse_ID', sort=False)[['Day', 'Start', 'End']].apply(
+        lambda shifts: tuple(sorted(map(tuple, shifts.to_numpy(dtype=int).tolist())))
+    )
+    return pd.Series(pd.factorize(availability)[0], index=availability.index)
+
+def aggregate_shifts(shift_df):
+    """One shift row per nurse type and shift time, 'Count' holds the number of nurses of the type"""
+    types = nurse_types(shift_df)
+    shift_type = shift_df['Nurse_ID'].map(types).to_numpy()
+    type_shifts = shift_df.assign(Type=shift_type).drop_duplicates(['Type', 'Day', 'Start', 'End']).reset_index(drop=True)
+    type_shifts['Count'] = type_shifts['Type'].map(types.value_counts())
+    type_shifts['Nurse_ID'] = type_shifts['Type']
+    return type_shifts, shift_type
+
+def aggregate_tasks(tasks_df):
+    """One task row per group of tasks with the same window, duration and staffing, 'Count' holds the group size"""
+    key = ['Start', 'End', 'Duration (interval)', '# Nurses']
+    task_group = tasks_df.groupby(key, sort=False).ngroup().to_numpy()
+    task_groups = tasks_df.drop_duplicates(key).reset_index(drop=True)
+    task_groups['Count'] = np.bincount(task_group)
+    return task_groups, task_group
+
+def aggregate_model(model, type_shifts, task_groups):
+    """Turn the pulse model of the aggregated rows into counts and replace the nurse rows F-I by per type rows"""
+    model.update()
+    variables = model.getVars()
+    names = model.getAttr('VarName', variables)
+    shift_count = type_shifts['Count'].to_numpy(dtype=float)
+    task_count = task_groups['Count'].to_numpy(dtype=float)
+
+    # A shift, break and handover variables count how many nurses of the type take the row, task starts how many tasks of the group start
+    counted = {'shift_scheduled': shift_count, 'break_start': shift_count, 'handover1_active': shift_count, 'handover2_active': shift_count, 'task_start': task_count}
+    vtypes = model.getAttr('VType', variables)
+    upper = model.getAttr('UB', variables)
+    for i, name in enumerate(names):
+        family = name.split('[')[0]
+        if family in counted:
+            count = counted[family][int(name.split('[')[1].split(',')[0].rstrip(']'))]
+            if count > 1:
+                vtypes[i] = gp.GRB.INTEGER
+                upper[i] = count
+    model.setAttr('VType', variables, vtypes)
+    model.setAttr('UB', variables, upper)
+
+    # B a group of tasks starts once per task and has no single start time
+    remove = []
+    for task in np.flatnonzero(task_count > 1):
+        model.getConstrByName(f"task_start_once[{task}]").RHS = task_count[task]
+        remove += [model.getConstrByName(f"task_start_time[{task}]"), model.getConstrByName(f"duration_constraint[{task}]")]
+        remove += [model.getVarByName(f"start_interval_day[{task}]"), model.getVarByName(f"end_interval_day[{task}]")]
+
+    # C the nurse rows are replaced by rows per type
+    remove += [
+        constraint for constraint in model.getConstrs()
+        if nrp._name_family(constraint.ConstrName) in ('nurse_used_lower', 'nurse_used_upper', 'min_shifts_week', 'max_shifts_week')
+    ]
+    remove += [var for var in model.getVars() if var.VarName.startswith('nurse_used_')]
+    model.remove(remove)
+
+    # D a type with m nurses in use takes every shift row at most m times and works 4-5 shifts per used nurse,
+    # those counts can always be handed out to m nurses of the type so that each gets 4-5 different shifts
+    types = type_shifts['Type'].to_numpy()
+    type_count = type_shifts.groupby('Type')['Count'].first().to_numpy(dtype=float)
+    nurses_used = model.addMVar(len(type_count), lb=0, ub=type_count, vtype=gp.GRB.INTEGER, name="type_nurses_used")
+    y = gp.MVar.fromlist([model.getVarByName(f"shift_scheduled[{shift}]") for shift in range(len(type_shifts))])
+    type_rows = sp.csr_matrix((np.ones(len(types)), (types, np.arange(len(types)))), shape=(len(type_count), len(types)))
+    eye_y = sp.identity(len(types), format='csr')
+    eye_m = sp.identity(len(type_count), format='csr')
+    model.addMConstr(sp.hstack([eye_y, -type_rows.T], format='csr'), gp.hstack([y, nurses_used]), '<', np.zeros(len(types)), name="type_shift_limit")
+    model.addMConstr(sp.hstack([type_rows, -nrp.min_shift_per_week * eye_m], format='csr'), gp.hstack([y, nurses_used]), '>', np.zeros(len(type_count)), name="min_shifts_week")
+    model.addMConstr(sp.hstack([type_rows, -nrp.max_shifts_per_week * eye_m], format='csr'), gp.hstack([y, nurses_used]), '<', np.zeros(len(type_count)), name="max_shifts_week")
+    model.update()
+
+def disaggregate(values, shift_df, shift_type, type_shifts, tasks_df, task_group):
+    """Shifts, breaks and task starts per original row from the counts of a solved aggregated model"""
+    initial = {
+        'shift_scheduled': np.zeros(len(shift_df), dtype=bool),
+        'break_start': np.full(len(shift_df), -1),
+        'task_start': np.full(len(tasks_df), -1),
+    }
+    counts = {}
+    for name, value in values.items():
+        if name.startswith(('break_start[', 'task_start[')) and value > 0.5:
+            family, index = name.rstrip(']').split('[')
+            row, t = map(int, index.split(','))
+            counts.setdefault((family, row), []).extend([t] * int(round(value)))
+
+    # A the copies of the rows of a type go round the used nurses of the type, so no nurse gets the same row twice
+    original = {key: row for row, key in enumerate(zip(shift_df['Nurse_ID'], shift_df['Day'], shift_df['Start'], shift_df['End']))}
+    nurse_ids = shift_df['Nurse_ID'].to_numpy()
+    for nurse_type, rows in type_shifts.groupby('Type', sort=False).groups.items():
+        members = pd.unique(nurse_ids[shift_type == nurse_type])
+        copies = []
+        for row in rows:
+            taken = int(round(values.get(f"shift_scheduled[{row}]", 0)))
+            breaks = sorted(counts.get(('break_start', row), []))
+            copies += [(row, breaks[i] if i < len(breaks) else -1) for i in range(taken)]
+        used = max(int(round(values.get(f"type_nurses_used[{nurse_type}]", 0))), 1)
+        for i, (row, break_start) in enumerate(copies):
+            shift = original[(members[i % used], type_shifts.loc[row, 'Day'], type_shifts.loc[row, 'Start'], type_shifts.loc[row, 'End'])]
+            initial['shift_scheduled'][shift] = True
+            initial['break_start'][shift] = break_start
+
+    # B the starts of a task group go to its tasks in order
+    for group in range(task_group.max() + 1 if len(task_group) else 0):
+        tasks = np.flatnonzero(task_group == group)
+        starts = sorted(counts.get(('task_start', group), []))
+        initial['task_start'][tasks[:len(starts)]] = starts[:len(tasks)]
+    return initial
+
+def symmetry_solution(tasks_df, shift_df, day_salary, night_salary, solver='gurobi', time_limit=300, rate_table=None, inline_aggregates=False, threads=None):
+    """Solve the pulse model over nurse types and task groups and map the counts back to Nurse_IDs
+
+    Nurses with the same availability and tasks with the same window, duration and staffing
+    are interchangeable, so the model counts how many of them take each shift row or start time
+    instead of deciding for every copy. The counts are handed out to individual nurses and
+    tasks afterwards and the constructive heuristic checks the schedule and completes it if needed.
+    threads caps the Gurobi threads of the count model.
+    """
+    solve_start = time.perf_counter()
+    if solver not in solvers:
+        raise ValueError(f"Unknown solver '{solver}', choose from {list(solvers)}")
+    type_shifts, shift_type = aggregate_shifts(shift_df)
+    task_groups, task_group = aggregate_tasks(tasks_df)
+    model = nrp.build_model(task_groups, type_shifts, day_salary, night_salary, time_limit, 'matrix', 'pulse', rate_table, inline_aggregates)
+    aggregate_model(model, type_shifts, task_groups)
+    if threads:
+        model.setParam('Threads', threads)
+    report = {
+        'nurses': shift_df['Nurse_ID'].nunique(),
+        'nurse_types': type_shifts['Type'].nunique(),
+        'shift_rows': len(shift_df),
+        'type_rows': len(type_shifts),
+        'tasks': len(tasks_df),
+        'task_groups': len(task_groups),
+        'variables': model.NumVars,
+        'constraints': model.NumConstrs,
+    }
+
+    result = solvers[solver](model)
+    report['aggregate_status'] = result.Status
+    runtime = time.perf_counter() - solve_start
+    if result.SolCount == 0:
+        solution = ScheduleSolution([], [], result.Status, runtime=runtime)
+    else:
+        values = {var.varName: var.x for var in result.getVars()}
+        initial = disaggregate(values, shift_df, shift_type, type_shifts, tasks_df, task_group)
+        schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+        runtime = time.perf_counter() - solve_start
+        if schedule is None:
+            solution = ScheduleSolution([], [], gp.GRB.INTERRUPTED, runtime=runtime)
+        else:
+            report['shifts_added'] = int((schedule['shift_scheduled'] & ~initial['shift_scheduled']).sum())
+            # the aggregated model is exact, so an optimal count solution stays optimal when nothing had to be added
+            status = result.Status if report['shifts_added'] == 0 else gp.GRB.SUBOPTIMAL
+            solution = ScheduleSolution(*heuristic.schedule_variables(tasks_df, schedule), status, schedule['cost'], result.ObjBound, runtime)
+
+    carry_input(solution, 'pulse', shift_df, tasks_df, nrp.interval_rates(day_salary, night_salary, rate_table))
+    solution._symmetry_report = report
+    return solution
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import uuid
+import warnings
+from datetime import datetime
+from contextlib import contextmanager
+import NRP_OBP_D as nrp
+try:
+    import resource
+except ImportError:  # Windows has no resource module, peak memory is left out there
+    resource = None
+
+log_path = os.path.join('logs', 'telemetry.jsonl')
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where the platform does not report it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def model_stats(model):
+    """Size of a Gurobi model before the solve"""
+    model.update()
+    return {
+        'variables': model.NumVars,
+        'integer_variables': model.NumIntVars,
+        'constraints': model.NumConstrs,
+        'quadratic_constraints': model.NumQConstrs,
+        'nonzeros': model.NumNZs,
+    }
+
+def solve_stats(result):
+    """Status, objective, bound, gap and the search log of a solved schedule"""
+    objective, bound, gap = nrp.solution_gap(result) if result.SolCount > 0 else (None, None, None)
+    stats = {
+        'status': result.Status,
+        'objective': objective,
+        'bound': bound,
+        'gap': gap,
+        'solver_seconds': result.Runtime,
+        'nodes': result.NodeCount,
+    }
+    stats.update(getattr(result, '_solve_log', None) or {})
+    return stats
+
+def write(record, path=None):
+    """Append one record as a JSON line, a log that can not be written never stops a solve"""
+    path = path or log_path
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as file:
+            file.write(json.dumps(record, default=float) + '\n')
+    except OSError as e:
+        warnings.warn(f"Telemetry not written to {path}: {e}")
+
+class Run:
+    """Wall time and peak memory per phase of one call to main, with the model size and the solver log"""
+    def __init__(self, **info):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.info = info
+        self.phases = []
+        self.model = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block and note how far it pushed the peak memory of the process"""
+        start, peak_before = time.perf_counter(), peak_rss_mb()
+        try:
+            yield
+        finally:
+            peak = peak_rss_mb()
+            self.phases.append({
+                'phase': name,
+                'seconds': time.perf_counter() - start,
+                'peak_rss_mb': peak,
+                'peak_rss_increase_mb': peak - peak_before if peak is not None else None,
+            })
+
+    def finish(self, result):
+        """Attach the record to the result as _telemetry, write it to the log and return the result"""
+        record = {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'info': self.info,
+            'seconds': time.perf_counter() - self.started,
+            'phases': self.phases,
+            'model': self.model,
+            'solve': solve_stats(result),
+        }
+        result._telemetry = record
+        write(record)
+        return result
+
+def log_phase(result, name, seconds):
+    """Record a phase that runs on a page after main, e.g. building the calendar, under the run of the result"""
+    record = getattr(result, '_telemetry', None)
+    write({
+        'run_id': record['run_id'] if record else None,
+        'logged_at': datetime.now().isoformat(timespec='seconds'),
+        'phases': [{'phase': name, 'seconds': seconds, 'peak_rss_mb': peak_rss_mb()}],
+    })
@@ -0,0 +1,173 @@
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import gurobipy as gp
+import heuristic
+import NRP_OBP_D as nrp
+from solver_backends import solvers
+
+def place_tasks_mip(tasks_df, shift_df, day_salary, night_salary, solver='gurobi', time_limit=60, rate_table=None, threads=None):
+    """Stage 1: place every task in its window so the sum of the daily demand peaks is smallest
+
+    Ties between placements with the same peaks go to the placement with the cheapest demand,
+    every interval costs its rate. Intervals in which every nurse is handing over are avoided. The model only has the task start indicators and one
+    peak per day, so it stays small enough for any license.
+    """
+    n_times = len(nrp.time_range)
+    times = np.arange(n_times)
+    task_start = tasks_df['Start'].to_numpy(dtype=int)
+    task_end = tasks_df['End'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    interval_rate = nrp.interval_rates(day_salary, night_salary, rate_table)
+
+    # A start indicators for every start that keeps the task inside its window and the week
+    starts_mask = (times[None, :] >= task_start[:, None]) & (times[None, :] <= np.minimum(task_end, n_times - duration)[:, None])
+    if not starts_mask.any(axis=1).all():
+        return None
+
+    # B starts that overlap an interval with only handing over nurses are left out where the window allows it
+    blocked_sums = np.concatenate([[0], np.cumsum(heuristic.handover_only_intervals(shift_df))])
+    end_time = np.minimum(times[None, :] + duration[:, None], n_times)
+    free_mask = starts_mask & (blocked_sums[end_time] == blocked_sums[times][None, :])
+    starts_mask = np.where(free_mask.any(axis=1)[:, None], free_mask, starts_mask)
+    model = gp.Model("TaskPlacement")
+    model.setParam('OutputFlag', 0)
+    model.setParam('TimeLimit', time_limit)
+    model.setParam('MIPGap', 0.01)
+    if threads:
+        model.setParam('Threads', threads)
+    starts, start_task, start_time = nrp._add_interval_vars(model, starts_mask, gp.GRB.BINARY, "task_start")
+    peaks = model.addMVar(len(nrp.weekdays), vtype=gp.GRB.CONTINUOUS, name=[f"peak_{day.lower()}" for day in nrp.weekdays])
+    demand = nrp._pulse_matrix(start_time, duration[start_task], n_times, values=task_nurses[start_task])
+
+    # C every task starts once
+    model.addMConstr(nrp._pair_matrix(start_task, len(tasks_df)), starts, '=', np.ones(len(tasks_df)), name="task_start_once")
+
+    # D the peak of a day is at least the demand of each of its intervals that a task can reach
+    reached = np.flatnonzero(demand.getnnz(axis=1) > 0)
+    day_of = sp.csr_matrix((np.ones(len(reached)), (np.arange(len(reached)), reached // 96)), shape=(len(reached), len(nrp.weekdays)))
+    model.addMConstr(sp.hstack([demand[reached], -day_of], format='csr'), gp.hstack([starts, peaks]), '<', np.zeros(len(reached)), name="day_peak")
+
+    # E Gurobi starts from the greedy placement
+    if solver == 'gurobi':
+        greedy, _ = heuristic.place_tasks(tasks_df, n_times, blocked=blocked_sums[1:] > blocked_sums[:-1])
+        if greedy is not None:
+            model.update()
+            starts.Start = (greedy[start_task] == start_time).astype(float)
+
+    cost = demand.T @ interval_rate
+    model.setObjective(peaks.sum() + starts @ (cost / max(cost.sum(), 1e-10)), gp.GRB.MINIMIZE)
+    result = solvers[solver](model)
+    if result.SolCount == 0:
+        return None
+
+    placed = np.full(len(tasks_df), -1)
+    for i in range(len(start_task)):
+        if result.getVarByName(f"task_start[{start_task[i]},{start_time[i]}]").X > 0.5:
+            placed[start_task[i]] = start_time[i]
+    return placed
+
+def improve_placement(tasks_df, task_start, blocked=None, passes=20):
+    """Move one task at a time to the start that lowers the sum of the daily peaks, then the squared demand"""
+    n_times = len(nrp.time_range)
+    task_start = task_start.copy()
+    earliest = tasks_df['Start'].to_numpy(dtype=int)
+    latest = tasks_df['End'].to_numpy(dtype=int)
+    duration = tasks_df['Duration (interval)'].to_numpy(dtype=int)
+    task_nurses = tasks_df['# Nurses'].to_numpy(dtype=float)
+    blocked_sums = np.concatenate([[0], np.cumsum(blocked if blocked is not None else np.zeros(n_times))])
+    demand = np.zeros(n_times)
+    for task, start in enumerate(task_start):
+        demand[start:start + duration[task]] += task_nurses[task]
+
+    def score(profile):
+        return profile.reshape(len(nrp.weekdays), -1).max(axis=1).sum(), (profile ** 2).sum()
+
+    for _ in range(passes):
+        moved = False
+        for task in range(len(tasks_df)):
+            starts = np.arange(max(earliest[task], 0), min(latest[task], n_times - duration[task]) + 1)
+            free = blocked_sums[starts + duration[task]] == blocked_sums[starts]
+            starts = starts[free] if free.any() else starts
+            demand[task_start[task]:task_start[task] + duration[task]] -= task_nurses[task]
+            best, best_score = task_start[task], None
+            for start in starts:
+                demand[start:start + duration[task]] += task_nurses[task]
+                candidate = score(demand)
+                demand[start:start + duration[task]] -= task_nurses[task]
+                if best_score is None or candidate < best_score or (candidate == best_score and start == task_start[task]):
+                    best, best_score = start, candidate
+            moved |= best != task_start[task]
+            task_start[task] = best
+            demand[best:best + duration[task]] += task_nurses[task]
+        if not moved:
+            break
+    return task_start
+
+def two_stage_solution(tasks_df, shift_df, day_salary, night_salary, solver='gurobi', formulation='pulse', time_limit=300, placement='greedy', rate_table=None, threads=None):
+    """Place the tasks first, then solve the staffing model with the tasks fixed
+
+    placement 'greedy' flattens the demand like the heuristic and improves it task by task,
+    'mip' solves place_tasks_mip. threads caps the Gurobi threads of both stages.
+    """
+    solve_start = time.perf_counter()
+    if placement == 'mip':
+        task_start = place_tasks_mip(tasks_df, shift_df, day_salary, night_salary, solver, time_limit, rate_table, threads)
+    else:
+        blocked = heuristic.handover_only_intervals(shift_df)
+        task_start, _ = heuristic.place_tasks(tasks_df, len(nrp.time_range), blocked=blocked)
+        if task_start is not None:
+            task_start = improve_placement(tasks_df, task_start, blocked)
+    placement_seconds = time.perf_counter() - solve_start
+    if task_start is None:
+        raise ValueError("The tasks can not be placed inside their windows")
+
+    # Stage 2: the placed tasks are a constant demand vector, the staffing model has no task variables or rows
+    model = nrp.build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', formulation, rate_table=rate_table, fixed_task_start=task_start)
+    model.setParam('TimeLimit', max(time_limit - placement_seconds, 1))
+    if threads:
+        model.setParam('Threads', threads)
+    initial = {
+        'shift_scheduled': np.zeros(len(shift_df), dtype=bool),
+        'break_start': np.full(len(shift_df), -1),
+        'task_start': task_start,
+    }
+    schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial, rate_table) if solver == 'gurobi' else None
+    if schedule is not None:
+        heuristic.set_mip_start(model, schedule)
+
+    result = solvers[solver](model)
+    result._two_stage_report = {
+        'placement': placement,
+        'placement_seconds': placement_seconds,
+        'staffing_seconds': time.perf_counter() - solve_start - placement_seconds,
+        'task_start': task_start,
+    }
+    return result
+
+def compare_two_stage(file_path, day_salary, night_salary, type_upload='only', time_limit=300, solver='gurobi', formulation='pulse'):
+    """Solve the joint model and both two-stage variants on the same instance and report the cost gap"""
+    tasks_df, shift_df = nrp.load_data(file_path, type_upload)
+    shift_df = nrp.filter_shifts(shift_df)
+
+    rows = []
+    for method in ('joint', 'greedy', 'mip'):
+        solve_start = time.perf_counter()
+        if method == 'joint':
+            model = nrp.build_model(tasks_df, shift_df, day_salary, night_salary, time_limit, 'matrix', formulation)
+            result = solvers[solver](model)
+        else:
+            result = two_stage_solution(tasks_df, shift_df, day_salary, night_salary, solver, formulation, time_limit, method)
+        rows.append({
+            'method': method,
+            'seconds': time.perf_counter() - solve_start,
+            'status': result.Status,
+            'objective': result.ObjVal if result.SolCount > 0 else None,
+        })
+
+    report = pd.DataFrame(rows)
+    joint = report.loc[report['method'] == 'joint', 'objective'].iloc[0]
+    report['gap_to_joint'] = (report['objective'] - joint) / joint if joint else None
+    return report
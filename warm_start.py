@@ -0,0 +1,130 @@
+import json
+import numpy as np
+import heuristic
+import NRP_OBP_D as nrp
+
+def solution_values(solution, prefixes):
+    """Values of the solution variables whose name starts with one of the prefixes"""
+    return {var.varName: var.x for var in solution.getVars() if var.varName.startswith(prefixes)}
+
+def export_schedule(solution):
+    """Describe a solved schedule by Nurse_ID/Day for shifts and task name/Day for tasks"""
+    shift_df = solution._shift_df
+    tasks_df = solution._tasks_df
+    values = solution_values(solution, ('shift_scheduled[', 'break_start', 'start_interval_day['))
+
+    # A break start per shift, from break_start_time or from the break_start indicators of the pulse formulation
+    break_start = {}
+    for name, value in values.items():
+        if name.startswith('break_start_time['):
+            break_start[int(name.split('[')[1].split(']')[0])] = int(round(value))
+        elif name.startswith('break_start[') and value > 0.5:
+            shift, t = name.split('[')[1].split(']')[0].split(',')
+            break_start[int(shift)] = int(t)
+
+    shifts = []
+    for shift in range(len(shift_df)):
+        if values.get(f"shift_scheduled[{shift}]", 0) > 0.5:
+            start = int(shift_df.loc[shift, 'Start'])
+            shifts.append({
+                'Nurse_ID': int(shift_df.loc[shift, 'Nurse_ID']),
+                'Day': int(shift_df.loc[shift, 'Day']),
+                'break_offset': break_start[shift] - start if shift in break_start else None,
+            })
+
+    # B task starts relative to the start of their day, so they carry over to another week
+    tasks = []
+    occurrence = tasks_df.groupby(['Task', 'Day']).cumcount()
+    for task in range(len(tasks_df)):
+        name = f"start_interval_day[{task}]"
+        if name in values:
+            day = int(tasks_df.loc[task, 'Day'])
+            tasks.append({
+                'Task': str(tasks_df.loc[task, 'Task']),
+                'Day': day,
+                'occurrence': int(occurrence.iloc[task]),
+                'start': int(round(values[name])) - (day - 1) * 96,
+            })
+    return {'shifts': shifts, 'tasks': tasks}
+
+def save_schedule(solution, path):
+    """Save a solved schedule so the next week can start from it"""
+    with open(path, 'w') as file:
+        json.dump(export_schedule(solution), file, indent=2)
+
+def load_schedule(previous):
+    """Previous schedule from a saved file, a solved model or an exported dictionary"""
+    if isinstance(previous, str):
+        with open(previous) as file:
+            return json.load(file)
+    if hasattr(previous, 'getVars'):
+        return export_schedule(previous)
+    return previous
+
+def map_schedule(previous, tasks_df, shift_df):
+    """Map a previous schedule onto this week's shift and task rows and report what still fits"""
+    previous = load_schedule(previous)
+    n_shifts = len(shift_df)
+    initial = {
+        'shift_scheduled': np.zeros(n_shifts, dtype=bool),
+        'break_start': np.full(n_shifts, -1),
+        'task_start': np.full(len(tasks_df), -1),
+    }
+
+    # A shifts by Nurse_ID and Day, the break keeps its offset from the shift start
+    shift_rows = {(int(nurse), int(day)): row for row, (nurse, day) in enumerate(zip(shift_df['Nurse_ID'], shift_df['Day']))}
+    for shift in previous['shifts']:
+        row = shift_rows.get((shift['Nurse_ID'], shift['Day']))
+        if row is not None:
+            initial['shift_scheduled'][row] = True
+            if shift['break_offset'] is not None:
+                initial['break_start'][row] = shift_df.loc[row, 'Start'] + shift['break_offset']
+
+    # B tasks by name, Day and occurrence, the start must still lie in the task window
+    occurrence = tasks_df.groupby(['Task', 'Day']).cumcount()
+    task_rows = {(str(name), int(day), int(n)): row for row, (name, day, n) in enumerate(zip(tasks_df['Task'], tasks_df['Day'], occurrence))}
+    tasks_mapped = 0
+    for task in previous['tasks']:
+        row = task_rows.get((task['Task'], task['Day'], task['occurrence']))
+        if row is None:
+            continue
+        tasks_mapped += 1
+        start = task['start'] + (task['Day'] - 1) * 96
+        if tasks_df.loc[row, 'Start'] <= start <= tasks_df.loc[row, 'End'] and start + tasks_df.loc[row, 'Duration (interval)'] <= len(nrp.time_range):
+            initial['task_start'][row] = start
+
+    report = {
+        'shifts_previous': len(previous['shifts']),
+        'shifts_mapped': int(initial['shift_scheduled'].sum()),
+        'tasks_previous': len(previous['tasks']),
+        'tasks_mapped': tasks_mapped,
+        'tasks_feasible': int((initial['task_start'] >= 0).sum()),
+    }
+    return initial, report
+
+def warm_start_schedule(previous, tasks_df, shift_df, day_salary, night_salary, rate_table=None):
+    """Repair the mapped previous schedule into a feasible schedule and report how much was kept"""
+    initial, report = map_schedule(previous, tasks_df, shift_df)
+    schedule = heuristic.construct_schedule(tasks_df, shift_df, day_salary, night_salary, initial, rate_table)
+
+    kept = initial['shift_scheduled'] & schedule['shift_scheduled'] if schedule is not None else np.zeros(len(shift_df), dtype=bool)
+    report['shifts_feasible'] = int(kept.sum())
+    report['shifts_added'] = 0 if schedule is None else int((schedule['shift_scheduled'] & ~initial['shift_scheduled']).sum())
+    report['shifts_kept_share'] = report['shifts_feasible'] / report['shifts_previous'] if report['shifts_previous'] else 0.0
+    report['repaired'] = schedule is not None
+    report['feasible_as_is'] = bool(
+        schedule is not None and report['shifts_added'] == 0 and report['shifts_feasible'] == report['shifts_mapped'] == report['shifts_previous']
+        and report['tasks_feasible'] == len(tasks_df)
+    )
+    return initial, schedule, report
+
+def set_hints(model, initial):
+    """Pass the mapped previous schedule to Gurobi as variable hints"""
+    model.update()
+    variables = model.getVars()
+    names = model.getAttr('VarName', variables)
+    hints = {f"shift_scheduled[{shift}]": float(scheduled) for shift, scheduled in enumerate(initial['shift_scheduled'])}
+    hints.update({f"start_interval_day[{task}]": float(start) for task, start in enumerate(initial['task_start']) if start >= 0})
+    hinted = [(var, hints[name]) for var, name in zip(variables, names) if name in hints]
+    if hinted:
+        model.setAttr('VarHintVal', [var for var, _ in hinted], [value for _, value in hinted])